@@ -1,10 +1,21 @@
 import jwt
+import hmac
+import time
 import uuid
 import base64
+import hashlib
+import threading
 
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Tuple
+from cachetools import TTLCache
 from django.conf import settings
-from datetime import datetime, timedelta
+from django.core.cache import cache
+from redis.exceptions import RedisError
+from django.core.exceptions import ValidationError
+from django.dispatch import receiver
+from django.core.signals import setting_changed
+from datetime import datetime, timedelta, timezone
 from django.contrib.auth import get_user_model
 from django.contrib.auth.hashers import check_password
 from rest_framework.exceptions import AuthenticationFailed
@@ -14,6 +25,162 @@ from rest_framework.authentication import BaseAuthentication, BasicAuthenticatio
 
 User = get_user_model()
 
+_JWT = jwt.PyJWT(options={'require': ['exp', 'user_id', 'token_id']})
+_JWT_ALGORITHM = 'HS256'
+_JWT_ALGORITHMS = [_JWT_ALGORITHM]
+
+
+@lru_cache(maxsize=1)
+def _jwt_secret() -> bytes:
+    """
+    Return the JWT signing key as bytes, resolved from settings once
+    """
+    return settings.SECRET_KEY.encode()
+
+
+@receiver(setting_changed)
+def _reset_jwt_secret(setting, **kwargs):
+    if setting == 'SECRET_KEY':
+        _jwt_secret.cache_clear()
+        with _payload_cache_lock:
+            _payload_cache.clear()
+
+
+_BEARER_PREFIX = 'Bearer '
+_BEARER_PREFIX_LEN = len(_BEARER_PREFIX)
+
+_PAYLOAD_CACHE_TTL = 60
+_payload_cache = TTLCache(maxsize=10000, ttl=_PAYLOAD_CACHE_TTL)
+_payload_cache_lock = threading.Lock()
+
+_BASIC_AUTH_CACHE_TTL = 30
+_basic_auth_cache = TTLCache(maxsize=10000, ttl=_BASIC_AUTH_CACHE_TTL)
+_basic_auth_cache_lock = threading.Lock()
+
+# Users are cached per session (user id and token id), so a new login never
+# reads an entry written for the previous token
+_USER_CACHE_TTL = 30
+_REVOKED_SESSION = 'revoked'
+
+# Columns read while serving an authenticated request; the password hash and
+# login timestamps stay deferred.
+_AUTH_USER_FIELDS = (
+    'id',
+    'phone_number',
+    'first_name',
+    'last_name',
+    'email',
+    'is_active',
+    'is_staff',
+    'is_superuser',
+    'is_verified',
+    'current_token_id',
+    'created_at',
+    'updated_at',
+)
+
+_ACCESS_TOKEN_TTL = timedelta(days=7)
+_REFRESH_TOKEN_TTL = timedelta(days=30)
+
+# Failure details are shared constants; exception instances are created per
+# raise so tracebacks never accumulate on a module-level object.
+_TOKEN_EXPIRED = 'Token has expired'
+_TOKEN_INVALID = 'Invalid token'
+_TOKEN_INVALID_PAYLOAD = 'Invalid token payload'
+_TOKEN_SUPERSEDED = 'Token has been invalidated by new login'
+_USER_NOT_FOUND = 'User not found'
+
+
+def _check_basic_password(user, password: str) -> bool:
+    """
+    Check a Basic auth password, remembering recent successful checks
+
+    The cache key is bound to the stored hash, so changing the password
+    invalidates it. Failed checks are never cached.
+    """
+    key = hashlib.sha256(f'{user.pk}:{user.password}:{password}'.encode()).digest()
+
+    with _basic_auth_cache_lock:
+        if key in _basic_auth_cache:
+            return True
+
+    if not check_password(password, user.password):
+        return False
+
+    with _basic_auth_cache_lock:
+        _basic_auth_cache[key] = True
+    return True
+
+
+def _user_cache_key(user_id, token_id) -> str:
+    return f'authuser:{user_id}:{token_id}'
+
+
+def _get_cached_user(user_id, token_id):
+    """Return the user cached for this session, or None on a miss or cache outage"""
+    try:
+        return cache.get(_user_cache_key(user_id, token_id))
+    except RedisError:
+        return None
+
+
+def _cache_user(user_id, token_id, user) -> None:
+    """
+    Cache the user for this session unless the key is already taken
+
+    add() never overwrites, so a request that loaded the user before its
+    session ended cannot replace the revocation marker left by
+    invalidate_cached_user().
+    """
+    try:
+        cache.add(_user_cache_key(user_id, token_id), user, _USER_CACHE_TTL)
+    except RedisError:
+        pass
+
+
+def invalidate_cached_user(user_id, token_id) -> None:
+    """
+    Revoke the cached authentication user of an ended session
+
+    The entry is replaced by a marker that outlives any cached copy, so the
+    token of that session is re-checked against the database from then on.
+    """
+    if not token_id:
+        return
+    try:
+        cache.set(_user_cache_key(user_id, token_id), _REVOKED_SESSION, _USER_CACHE_TTL)
+    except RedisError:
+        pass
+
+
+def _decode_token(token: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Decode a JWT token and return its (user_id, token_id) claims
+
+    Verified payloads are kept for a short time keyed by a truncated hash
+    of the token, so repeated requests with the same token skip signature
+    verification. Failures are never cached.
+    """
+    key = hashlib.sha256(token.encode()).digest()[:16]
+
+    with _payload_cache_lock:
+        cached = _payload_cache.get(key)
+
+    if cached is not None and cached[2] > time.time():
+        return cached[0], cached[1]
+
+    payload = _JWT.decode(token, _jwt_secret(), algorithms=_JWT_ALGORITHMS)
+
+    user_id = payload.get('user_id')
+    token_id = payload.get('token_id')
+
+    if user_id and token_id:
+        expires_at = payload.get('exp', time.time() + _PAYLOAD_CACHE_TTL)
+        with _payload_cache_lock:
+            _payload_cache[key] = (user_id, token_id, expires_at)
+
+    return user_id, token_id
+
 
 class JWTAuthentication(BaseAuthentication):
     """
@@ -26,40 +193,40 @@ class JWTAuthentication(BaseAuthentication):
         """
         auth_header = request.META.get('HTTP_AUTHORIZATION')
 
-        if not auth_header or not auth_header.startswith('Bearer '):
+        if (
+            not auth_header
+            or len(auth_header) <= _BEARER_PREFIX_LEN
+            or auth_header[:_BEARER_PREFIX_LEN] != _BEARER_PREFIX
+        ):
             return None
 
-        token = auth_header.split(' ')[1]
+        token = auth_header[_BEARER_PREFIX_LEN:]
 
         try:
-            payload = jwt.decode(
-                token, 
-                settings.SECRET_KEY, 
-                algorithms=['HS256']
-            )
+            user_id, token_id = _decode_token(token)
+        except jwt.ExpiredSignatureError:
+            raise AuthenticationFailed(_TOKEN_EXPIRED)
+        except jwt.InvalidTokenError:
+            raise AuthenticationFailed(_TOKEN_INVALID)
 
-            user_id = payload.get('user_id')
-            token_id = payload.get('token_id')
+        if not user_id or not token_id:
+            raise AuthenticationFailed(_TOKEN_INVALID_PAYLOAD)
 
-            if not user_id or not token_id:
-                raise AuthenticationFailed('Invalid token payload')
+        user = _get_cached_user(user_id, token_id)
+        if user == _REVOKED_SESSION:
+            raise AuthenticationFailed(_TOKEN_SUPERSEDED)
 
+        if user is None:
             try:
-                user = User.objects.get(id=user_id)
-            except User.DoesNotExist:
-                raise AuthenticationFailed('User not found')
-
-            if user.current_token_id != token_id:
-                raise AuthenticationFailed('Token has been invalidated by new login')
-                
-            return (user, token)
-            
-        except jwt.ExpiredSignatureError:
-            raise AuthenticationFailed('Token has expired')
-        except jwt.InvalidTokenError:
-            raise AuthenticationFailed('Invalid token')
-        except Exception as e:
-            raise AuthenticationFailed(f'Authentication failed: {str(e)}')
+                user = User.objects.only(*_AUTH_USER_FIELDS).get(id=user_id)
+            except (User.DoesNotExist, ValidationError):
+                raise AuthenticationFailed(_USER_NOT_FOUND)
+
+            if not hmac.compare_digest(str(user.current_token_id or ''), str(token_id)):
+                raise AuthenticationFailed(_TOKEN_SUPERSEDED)
+            _cache_user(user_id, token_id, user)
+
+        return (user, token)
     
     def authenticate_header(self, request):
         """
@@ -80,22 +247,29 @@ class BasicAuth(BaseAuthentication):
         """
         auth_header = request.META.get('HTTP_AUTHORIZATION')
         
-        if not auth_header or not auth_header.startswith('Basic '):
+        if not auth_header:
+            return None
+
+        scheme, sep, encoded_credentials = auth_header.partition(' ')
+        if sep != ' ' or scheme != 'Basic' or not encoded_credentials:
             return None
             
         try:
-            encoded_credentials = auth_header.split(' ')[1]
             decoded_credentials = base64.b64decode(encoded_credentials).decode('utf-8')
             phone_number, password = decoded_credentials.split(':', 1)
         except (ValueError, UnicodeDecodeError):
             return None
             
         try:
-            user = User.objects.get(phone_number=phone_number)
-            if check_password(password, user.password):
-                return (user, None)
+            user = User.objects.only(*_AUTH_USER_FIELDS, 'password').get(phone_number=phone_number)
         except User.DoesNotExist:
-            pass
+            # Run the password hasher anyway so a missing user takes as long
+            # as a wrong password.
+            User().set_password(password)
+            return None
+
+        if _check_basic_password(user, password):
+            return (user, None)
             
         return None
     
@@ -113,41 +287,67 @@ class JWTTokenGenerator:
     """
     
     @staticmethod
-    def generate_token(user) -> str:
+    def _start_session(user) -> Tuple[str, datetime]:
         """
-        Generate a JWT token for the given user with single session support
+        Store a new session token id for the user and return it with the issue time
         """
-        token_id = str(uuid.uuid4())
-        
+        token_id = uuid.uuid4().hex
+
+        User.objects.filter(pk=user.pk).update(current_token_id=token_id)
+        invalidate_cached_user(user.id, user.current_token_id)
+        user.current_token_id = token_id
+
+        return token_id, datetime.now(tz=timezone.utc)
+
+    @staticmethod
+    def _encode_access(user, token_id: str, now: datetime) -> str:
         payload = {
             'user_id': str(user.id),
             'phone_number': user.phone_number,
             'token_id': token_id,
-            'exp': datetime.utcnow() + timedelta(days=7),
-            'iat': datetime.utcnow(),
+            'exp': now + _ACCESS_TOKEN_TTL,
+            'iat': now,
         }
+        return _JWT.encode(payload, _jwt_secret(), algorithm=_JWT_ALGORITHM)
 
-        user.current_token_id = token_id
-        user.save(update_fields=['current_token_id'])
-        
-        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
-    
     @staticmethod
-    def generate_refresh_token(user) -> str:
-        """
-        Generate a refresh token for the given user with single session support
-        """
-        token_id = user.current_token_id or str(uuid.uuid4())
-        
+    def _encode_refresh(user, token_id: str, now: datetime) -> str:
         payload = {
             'user_id': str(user.id),
             'type': 'refresh',
             'token_id': token_id,
-            'exp': datetime.utcnow() + timedelta(days=30),
-            'iat': datetime.utcnow(),
+            'exp': now + _REFRESH_TOKEN_TTL,
+            'iat': now,
         }
-        
-        return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+        return _JWT.encode(payload, _jwt_secret(), algorithm=_JWT_ALGORITHM)
+
+    @staticmethod
+    def generate_token(user) -> str:
+        """
+        Generate a JWT token for the given user with single session support
+        """
+        token_id, now = JWTTokenGenerator._start_session(user)
+        return JWTTokenGenerator._encode_access(user, token_id, now)
+    
+    @staticmethod
+    def generate_refresh_token(user) -> str:
+        """
+        Generate a refresh token for the given user with single session support
+        """
+        token_id = user.current_token_id or uuid.uuid4().hex
+        now = datetime.now(tz=timezone.utc)
+        return JWTTokenGenerator._encode_refresh(user, token_id, now)
+
+    @staticmethod
+    def generate_token_pair(user) -> Tuple[str, str]:
+        """
+        Start a new session and return its (access, refresh) tokens
+        """
+        token_id, now = JWTTokenGenerator._start_session(user)
+        return (
+            JWTTokenGenerator._encode_access(user, token_id, now),
+            JWTTokenGenerator._encode_refresh(user, token_id, now),
+        )
     
     @staticmethod
     def verify_token(token: str) -> Optional[dict]:
@@ -155,7 +355,7 @@ class JWTTokenGenerator:
         Verify and decode a JWT token
         """
         try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+            payload = _JWT.decode(token, _jwt_secret(), algorithms=_JWT_ALGORITHMS)
             return payload
         except jwt.ExpiredSignatureError:
             return None
@@ -194,4 +394,5 @@ __all__ = [
     'JWTTokenGenerator',
     'JWTAuthenticationExtension',
     'BasicAuthExtension',
+    'invalidate_cached_user',
 ]
@@ -1,7 +1,24 @@
 from django.contrib import admin
+from django.contrib.admin.views.main import ChangeList
 from apps.order.models import Customer, Order, OrderItem, Payment
 
 
+class OnlyFieldsChangeList(ChangeList):
+    """Changelist that loads only the columns the list page renders"""
+
+    def get_queryset(self, request, exclude_parameters=None):
+        queryset = super().get_queryset(request, exclude_parameters)
+        return queryset.only(*self.model_admin.list_only_fields)
+
+
+class ListOnlyFieldsMixin:
+    """Restrict changelist rows to `list_only_fields`; change views load full rows"""
+    list_only_fields = ()
+
+    def get_changelist(self, request, **kwargs):
+        return OnlyFieldsChangeList
+
+
 @admin.register(Customer)
 class CustomerAdmin(admin.ModelAdmin):
     list_display = ['full_name', 'email', 'phone_number', 'city', 'country', 'created_at']
@@ -23,11 +40,16 @@ class PaymentInline(admin.TabularInline):
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
+class OrderAdmin(ListOnlyFieldsMixin, admin.ModelAdmin):
     list_display = [
         'order_number', 'customer', 'status', 'total_amount',
         'created_at', 'updated_at'
     ]
+    list_select_related = ['customer']
+    list_only_fields = [
+        'id', 'order_number', 'customer', 'status', 'total_amount', 'created_at',
+        'updated_at', 'customer__full_name', 'customer__email'
+    ]
     list_filter = ['status', 'created_at', 'updated_at']
     search_fields = ['order_number', 'customer__email', 'customer__full_name']
     readonly_fields = [
@@ -53,22 +75,32 @@ class OrderAdmin(admin.ModelAdmin):
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ListOnlyFieldsMixin, admin.ModelAdmin):
     list_display = [
         'order', 'product_name', 'product_sku', 'quantity',
         'unit_price', 'total_price', 'created_at'
     ]
+    list_select_related = ['order']
+    list_only_fields = [
+        'id', 'order', 'product_name', 'product_sku', 'quantity', 'unit_price',
+        'total_price', 'created_at', 'order__order_number', 'order__status'
+    ]
     list_filter = ['created_at']
     search_fields = ['product_name', 'product_sku', 'order__order_number']
     readonly_fields = ['id', 'total_price', 'created_at', 'updated_at']
 
 
 @admin.register(Payment)
-class PaymentAdmin(admin.ModelAdmin):
+class PaymentAdmin(ListOnlyFieldsMixin, admin.ModelAdmin):
     list_display = [
         'transaction_id', 'order', 'payment_method', 'amount',
         'status', 'processed_at', 'created_at'
     ]
+    list_select_related = ['order']
+    list_only_fields = [
+        'id', 'transaction_id', 'order', 'payment_method', 'amount', 'status',
+        'processed_at', 'created_at', 'order__order_number', 'order__status'
+    ]
     list_filter = ['status', 'payment_method', 'created_at', 'processed_at']
     search_fields = ['transaction_id', 'order__order_number']
     readonly_fields = [
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from apps.order.services import OrderService
+
+
+class Command(BaseCommand):
+    """
+    Return orders stuck in PROCESSING to PENDING so they can be paid again
+    """
+    help = 'Release payment claims older than PAYMENT_PROCESSING_TIMEOUT'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--timeout',
+            type=int,
+            help='Claim age in seconds (defaults to PAYMENT_PROCESSING_TIMEOUT)',
+        )
+
+    def handle(self, *args, **options):
+        timeout = options['timeout']
+        released = OrderService.release_stale_payments(
+            timedelta(seconds=timeout) if timeout is not None else None
+        )
+        self.stdout.write(f'Released {released} stale payment claim(s)')
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.6 on 2026-10-15 00:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("order", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["status", "-created_at"], name="order_status_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="order",
+            index=models.Index(
+                fields=["customer", "status", "-created_at"],
+                name="order_cust_status_date_idx",
+            ),
+        ),
+    ]
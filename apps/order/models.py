@@ -1,13 +1,19 @@
 from django.db import models
+from django.db.models import Sum
 from django.core.validators import MinValueValidator, EmailValidator
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
 from decimal import Decimal
+from typing import Optional
 
 from apps.base.models import BaseModel
 
 
+_TAX_RATE = Decimal('0.12')
+_CENT = Decimal('0.01')
+
+
 class Customer(BaseModel):
     """
     Customer model to store customer information
@@ -155,6 +161,8 @@ class Order(BaseModel):
             models.Index(fields=['order_number'], name='order_number_idx'),
             models.Index(fields=['status'], name='order_status_idx'),
             models.Index(fields=['customer', '-created_at'], name='order_customer_date_idx'),
+            models.Index(fields=['status', '-created_at'], name='order_status_date_idx'),
+            models.Index(fields=['customer', 'status', '-created_at'], name='order_cust_status_date_idx'),
         ]
 
     def __str__(self):
@@ -165,24 +173,24 @@ class Order(BaseModel):
         super().clean()
 
         calculated_total = self.subtotal + self.tax_amount + self.shipping_cost
-        if abs(self.total_amount - calculated_total) > Decimal('0.01'):
+        if abs(self.total_amount - calculated_total) > _CENT:
             raise ValidationError({
                 'total_amount': _('Total amount must equal subtotal + tax + shipping')
             })
 
-    def calculate_totals(self):
-        """Calculate order totals from order items"""
-        items = self.items.all()
-        self.subtotal = sum(item.total_price for item in items)
-        self.tax_amount = (self.subtotal * Decimal('0.12')).quantize(Decimal('0.01'))
+    def calculate_totals(self, subtotal: Optional[Decimal] = None):
+        """Calculate order totals from order items, or from a precomputed subtotal"""
+        if subtotal is None:
+            subtotal = self.items.aggregate(subtotal=Sum('total_price'))['subtotal'] or Decimal('0.00')
+        self.subtotal = subtotal
+        self.tax_amount = (self.subtotal * _TAX_RATE).quantize(_CENT)
         self.total_amount = self.subtotal + self.tax_amount + self.shipping_cost
         return self.total_amount
 
     def can_be_cancelled(self):
-        """Check if order can be cancelled"""
+        """Check if order can be cancelled; a PROCESSING order has a payment in flight"""
         return self.status in [
             self.OrderStatus.PENDING,
-            self.OrderStatus.PROCESSING,
             self.OrderStatus.CONFIRMED
         ]
 
@@ -249,7 +257,7 @@ class OrderItem(BaseModel):
         super().clean()
 
         calculated_total = self.unit_price * self.quantity
-        if abs(self.total_price - calculated_total) > Decimal('0.01'):
+        if abs(self.total_price - calculated_total) > _CENT:
             raise ValidationError({
                 'total_price': _('Total price must equal unit_price * quantity')
             })
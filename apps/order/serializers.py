@@ -1,10 +1,15 @@
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
+from drf_spectacular.utils import extend_schema_field
 from decimal import Decimal
 
 from apps.order.models import Customer, Order, OrderItem, Payment
 
 
+_PAYMENT_METHOD_CHOICES = Payment.PaymentMethod.choices
+_ORDER_STATUS_CHOICES = Order.OrderStatus.choices
+
+
 class CustomerSerializer(serializers.ModelSerializer):
     """Serializer for Customer model"""
     user_id = serializers.UUIDField(source='user.id', read_only=True, allow_null=True)
@@ -96,10 +101,26 @@ class PaymentSerializer(serializers.ModelSerializer):
         ]
 
 
+_decimal_field = serializers.DecimalField(max_digits=10, decimal_places=2)
+_datetime_field = serializers.DateTimeField()
+
+
+def _related_rows(order, name):
+    """Rows held in order.prefetched_<name> (Prefetch to_attr), else the related manager"""
+    rows = getattr(order, f'prefetched_{name}', None)
+    return rows if rows is not None else getattr(order, name).all()
+
+
 class OrderSerializer(serializers.ModelSerializer):
-    """Serializer for Order model with nested items and payments"""
-    items = OrderItemSerializer(many=True, read_only=True)
-    payments = PaymentSerializer(many=True, read_only=True)
+    """
+    Serializer for Order model with nested items and payments
+
+    Items and payments are rendered as plain dicts from the prefetched_items
+    and prefetched_payments lists when the order carries them, falling back to
+    the related managers, instead of instantiating a nested serializer per order.
+    """
+    items = serializers.SerializerMethodField()
+    payments = serializers.SerializerMethodField()
     customer = CustomerSerializer(read_only=True)
 
     class Meta:
@@ -131,6 +152,40 @@ class OrderSerializer(serializers.ModelSerializer):
             'updated_at',
         ]
 
+    @extend_schema_field(OrderItemSerializer(many=True))
+    def get_items(self, obj):
+        return [
+            {
+                'id': str(item.id),
+                'product_name': item.product_name,
+                'product_sku': item.product_sku,
+                'quantity': item.quantity,
+                'unit_price': _decimal_field.to_representation(item.unit_price),
+                'total_price': _decimal_field.to_representation(item.total_price),
+                'metadata': item.metadata,
+            }
+            for item in _related_rows(obj, 'items')
+        ]
+
+    @extend_schema_field(PaymentSerializer(many=True))
+    def get_payments(self, obj):
+        return [
+            {
+                'id': str(payment.id),
+                'transaction_id': payment.transaction_id,
+                'payment_method': payment.payment_method,
+                'amount': _decimal_field.to_representation(payment.amount),
+                'currency': payment.currency,
+                'status': payment.status,
+                'payment_gateway': payment.payment_gateway,
+                'error_message': payment.error_message,
+                'processed_at': _datetime_field.to_representation(payment.processed_at),
+                'created_at': _datetime_field.to_representation(payment.created_at),
+                'updated_at': _datetime_field.to_representation(payment.updated_at),
+            }
+            for payment in _related_rows(obj, 'payments')
+        ]
+
 
 class OrderCreateSerializer(serializers.Serializer):
     """Serializer for creating a new order with atomic transaction"""
@@ -151,7 +206,7 @@ class OrderCreateSerializer(serializers.Serializer):
     items = OrderItemCreateSerializer(many=True, help_text="List of order items")
 
     payment_method = serializers.ChoiceField(
-        choices=Payment.PaymentMethod.choices,
+        choices=_PAYMENT_METHOD_CHOICES,
         help_text="Payment method"
     )
 
@@ -177,13 +232,13 @@ class OrderCreateSerializer(serializers.Serializer):
 
 class OrderStatusUpdateSerializer(serializers.Serializer):
     """Serializer for updating order status"""
-    status = serializers.ChoiceField(choices=Order.OrderStatus.choices)
+    status = serializers.ChoiceField(choices=_ORDER_STATUS_CHOICES)
     notes = serializers.CharField(required=False, allow_blank=True)
 
 
 class PaymentProcessSerializer(serializers.Serializer):
     """Serializer for processing payment"""
-    payment_method = serializers.ChoiceField(choices=Payment.PaymentMethod.choices)
+    payment_method = serializers.ChoiceField(choices=_PAYMENT_METHOD_CHOICES)
     payment_gateway = serializers.CharField(required=False, allow_blank=True, default='')
 
 
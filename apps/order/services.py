@@ -1,16 +1,22 @@
-import uuid
+import time
+import secrets
+from datetime import timedelta
 from decimal import Decimal
-from datetime import datetime
 from typing import Dict, List, Optional
 
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import F, TextField, Value
+from django.db.models.functions import Concat
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from apps.order.models import Customer, Order, OrderItem, Payment
 
+_ITEM_BATCH_SIZE = 500
+_NUMBER_TIMESTAMP_FORMAT = '%Y%m%d%H%M%S'
+
 
 class OrderProcessingError(Exception):
     """Custom exception for order processing errors"""
@@ -41,30 +47,42 @@ class OrderService:
         if not user or not user.is_authenticated:
             return None
 
-        try:
-            return Customer.objects.get(user=user)
-        except Customer.DoesNotExist:
-            return Customer.objects.create(
-                user=user,
-                email=user.email if user.email else f"{user.phone_number}@placeholder.com",
-                full_name=user.full_name if hasattr(user, 'full_name') else f"{user.first_name} {user.last_name}".strip(),
-                phone_number=user.phone_number if hasattr(user, 'phone_number') else '',
-            )
+        customer = getattr(user, '_cached_customer', None)
+        if customer is not None:
+            return customer
+
+        customer, _ = Customer.objects.get_or_create(
+            user=user,
+            defaults={
+                'email': user.email if user.email else f"{user.phone_number}@placeholder.com",
+                'full_name': user.full_name if hasattr(user, 'full_name') else f"{user.first_name} {user.last_name}".strip(),
+                'phone_number': user.phone_number if hasattr(user, 'phone_number') else '',
+            },
+        )
+        customer.user = user
+
+        user._cached_customer = customer
+        return customer
 
     @staticmethod
     def generate_order_number() -> str:
         """Generate unique order number"""
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = str(uuid.uuid4().hex[:6]).upper()
+        timestamp = time.strftime(_NUMBER_TIMESTAMP_FORMAT)
+        random_suffix = secrets.token_hex(3).upper()
         return f"ORD-{timestamp}-{random_suffix}"
 
     @staticmethod
     def generate_transaction_id() -> str:
         """Generate unique transaction ID"""
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-        random_suffix = str(uuid.uuid4().hex[:8]).upper()
+        timestamp = time.strftime(_NUMBER_TIMESTAMP_FORMAT)
+        random_suffix = secrets.token_hex(4).upper()
         return f"TXN-{timestamp}-{random_suffix}"
 
+    @staticmethod
+    def _get_order_for_response(order_id) -> Order:
+        """Load the full order row and its customer after a narrow locked update"""
+        return Order.objects.select_related('customer__user').get(pk=order_id)
+
     @staticmethod
     @transaction.atomic
     def create_order(
@@ -101,7 +119,9 @@ class OrderService:
         try:
             if customer_id:
                 try:
-                    customer = Customer.objects.select_for_update().get(id=customer_id)
+                    customer = Customer.objects.select_for_update(
+                        of=('self',), no_key=True
+                    ).select_related('user').get(id=customer_id)
                 except Customer.DoesNotExist:
                     raise OrderProcessingError(_('Customer not found'))
             else:
@@ -115,25 +135,31 @@ class OrderService:
                     phone_number=customer_data.get('customer_phone'),
                 )
 
-            order_number = OrderService.generate_order_number()
-            order = Order.objects.create(
+            if not items_data:
+                raise OrderProcessingError(_('At least one order item is required'))
+
+            order = Order(
                 customer=customer,
-                order_number=order_number,
+                order_number=OrderService.generate_order_number(),
                 status=Order.OrderStatus.PENDING,
                 shipping_address=shipping_address,
                 shipping_cost=shipping_cost,
                 notes=notes,
             )
 
-            if not items_data:
-                raise OrderProcessingError(_('At least one order item is required'))
-
+            items = []
+            subtotal = Decimal('0.00')
             for item_data in items_data:
-                unit_price = Decimal(str(item_data['unit_price']))
-                quantity = int(item_data['quantity'])
+                unit_price = item_data['unit_price']
+                if not isinstance(unit_price, Decimal):
+                    unit_price = Decimal(str(unit_price))
+                quantity = item_data['quantity']
+                if not isinstance(quantity, int):
+                    quantity = int(quantity)
                 total_price = unit_price * quantity
+                subtotal += total_price
 
-                OrderItem.objects.create(
+                items.append(OrderItem(
                     order=order,
                     product_name=item_data['product_name'],
                     product_sku=item_data.get('product_sku', ''),
@@ -141,10 +167,11 @@ class OrderService:
                     unit_price=unit_price,
                     total_price=total_price,
                     metadata=item_data.get('metadata', {}),
-                )
+                ))
 
-            order.calculate_totals()
-            order.save()
+            order.calculate_totals(subtotal)
+            order.save(force_insert=True)
+            OrderItem.objects.bulk_create(items, batch_size=_ITEM_BATCH_SIZE)
 
             transaction_id = OrderService.generate_transaction_id()
             payment = Payment.objects.create(
@@ -155,6 +182,10 @@ class OrderService:
                 status=Payment.PaymentStatus.PENDING,
             )
 
+            # Rendered by OrderSerializer as if prefetched, so the rows just
+            # inserted are not selected again
+            order.prefetched_items = items
+            order.prefetched_payments = [payment]
             return order
 
         except ValidationError as e:
@@ -163,79 +194,260 @@ class OrderService:
             raise OrderProcessingError(f'Order creation failed: {str(e)}')
 
     @staticmethod
-    @transaction.atomic
     def process_payment(order_id: str, payment_gateway: str = '') -> Payment:
         """
         Process payment for an order with race condition prevention
 
-        Uses select_for_update() to lock the order row during payment processing,
-        preventing concurrent payment attempts on the same order.
+        The order and its pending payment are claimed (moved to PROCESSING) in
+        a short transaction, the gateway is called with no locks held, and the
+        result is recorded in a second transaction. A processing order cannot
+        be cancelled or paid again, and it is confirmed only if its version is
+        unchanged since the claim. Any attempt that does not confirm the order
+        returns it to PENDING with a fresh pending payment, and a charge that
+        can no longer be applied is voided. Claims abandoned by a crashed
+        worker are released by release_stale_payments().
 
         Args:
             order_id: Order ID
             payment_gateway: Payment gateway identifier
 
         Returns:
-            Updated Payment instance
+            Updated Payment instance; payment.order carries the order's new
+            status and version
 
         Raises:
             PaymentProcessingError: If payment processing fails
         """
         try:
-            order = Order.objects.select_for_update().get(id=order_id)
+            order, payment = OrderService._begin_payment(order_id, payment_gateway)
 
-            if order.status not in [Order.OrderStatus.PENDING, Order.OrderStatus.PROCESSING]:
-                raise PaymentProcessingError(
-                    _('Order cannot be processed in current status: {}').format(order.status)
-                )
+            charged = False
+            if settings.PAYMENT_GATEWAY_ENABLED:
+                try:
+                    charged = OrderService._simulate_payment_processing(payment)
+                except Exception:
+                    OrderService._finalize_payment(order, payment, False)
+                    raise
+                payment_success = charged
+            else:
+                payment_success = True
 
-            payment = Payment.objects.select_for_update().filter(
-                order=order,
-                status=Payment.PaymentStatus.PENDING
-            ).first()
+            payment = OrderService._finalize_payment(order, payment, payment_success)
+            if payment.status != Payment.PaymentStatus.COMPLETED:
+                if charged:
+                    OrderService._void_charge(payment)
+                raise PaymentProcessingError(payment.error_message)
 
-            if not payment:
-                raise PaymentProcessingError(_('No pending payment found for this order'))
+            return payment
 
-            order.status = Order.OrderStatus.PROCESSING
-            order.save(update_fields=['status', 'updated_at'])
+        except Order.DoesNotExist:
+            raise PaymentProcessingError(_('Order not found'))
+        except Exception as e:
+            raise PaymentProcessingError(f'Payment processing error: {str(e)}')
+
+    @staticmethod
+    @transaction.atomic
+    def _begin_payment(order_id: str, payment_gateway: str):
+        """
+        Claim a pending order and its pending payment by moving both to PROCESSING
+
+        The order is claimed with a version-checked UPDATE rather than a row
+        lock; losing that race to another payment or a cancellation rolls the
+        payment claim back.
+        """
+        order = Order.objects.only('id', 'status', 'version').get(id=order_id)
 
-            payment.status = Payment.PaymentStatus.PROCESSING
-            payment.payment_gateway = payment_gateway
-            payment.save(update_fields=['status', 'payment_gateway', 'updated_at'])
+        if order.status != Order.OrderStatus.PENDING:
+            raise PaymentProcessingError(
+                _('Order cannot be processed in current status: {}').format(order.status)
+            )
+
+        payment = Payment.objects.select_for_update(of=('self',), no_key=True).filter(
+            order=order,
+            status=Payment.PaymentStatus.PENDING
+        ).defer('gateway_response').first()
+
+        if not payment:
+            raise PaymentProcessingError(_('No pending payment found for this order'))
+
+        now = timezone.now()
+        claimed = Order.objects.filter(
+            pk=order.pk,
+            status=Order.OrderStatus.PENDING,
+            version=order.version,
+        ).update(
+            status=Order.OrderStatus.PROCESSING,
+            version=F('version') + 1,
+            updated_at=now,
+        )
+        if not claimed:
+            raise PaymentProcessingError(_('Order was modified concurrently, please retry'))
+
+        order.status = Order.OrderStatus.PROCESSING
+        order.version += 1
+        order.updated_at = now
+
+        payment.status = Payment.PaymentStatus.PROCESSING
+        payment.payment_gateway = payment_gateway
+        payment.updated_at = now
+        Payment.objects.filter(pk=payment.pk).update(
+            status=payment.status,
+            payment_gateway=payment_gateway,
+            updated_at=now,
+        )
+
+        return order, payment
 
-            payment_success = OrderService._simulate_payment_processing(payment)
+    @staticmethod
+    @transaction.atomic
+    def _finalize_payment(order: Order, payment: Payment, payment_success: bool) -> Payment:
+        """
+        Record the gateway result on a claimed payment and settle the order
+
+        A successful payment confirms the order only while it is still the
+        PROCESSING version claimed by _begin_payment. Every other outcome
+        releases the claim: a PROCESSING order returns to PENDING with a fresh
+        pending payment so it can be paid again. A successful payment that
+        cannot confirm the order is recorded as cancelled so the caller can
+        void the charge.
+        """
+        payment.order = order
+        now = timezone.now()
+        still_processing = Payment.objects.select_for_update(of=('self',), no_key=True).filter(
+            pk=payment.pk,
+            status=Payment.PaymentStatus.PROCESSING
+        ).exists()
+        if not still_processing:
+            # Timed out by release_stale_payments() or changed by staff; the stored row stays as is
+            OrderService._release_order(order, payment, now)
+            payment.status = Payment.PaymentStatus.CANCELLED
+            payment.error_message = 'Payment was cancelled during processing'
+            return payment
 
-            if payment_success:
+        if payment_success:
+            confirmed = Order.objects.filter(
+                pk=order.pk,
+                status=Order.OrderStatus.PROCESSING,
+                version=order.version,
+            ).update(
+                status=Order.OrderStatus.CONFIRMED,
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            if confirmed:
+                order.status = Order.OrderStatus.CONFIRMED
+                order.version += 1
+                order.updated_at = now
                 payment.status = Payment.PaymentStatus.COMPLETED
-                payment.processed_at = timezone.now()
+                payment.processed_at = now
                 payment.gateway_response = {'status': 'success', 'message': 'Payment processed successfully'}
-                payment.save(update_fields=['status', 'processed_at', 'gateway_response', 'updated_at'])
+            else:
+                payment.status = Payment.PaymentStatus.CANCELLED
+                payment.error_message = 'Order was modified concurrently, please retry'
+        else:
+            payment.status = Payment.PaymentStatus.FAILED
+            payment.error_message = 'Payment processing failed'
+            payment.gateway_response = {'status': 'failed', 'message': 'Payment declined'}
+
+        if payment.status != Payment.PaymentStatus.COMPLETED:
+            # The payment is still this attempt's claim, so a PROCESSING order is
+            # still ours even if its version was bumped in the meantime
+            OrderService._release_order(order, payment, now, any_version=True)
+
+        payment.updated_at = now
+        Payment.objects.filter(pk=payment.pk).update(
+            status=payment.status,
+            processed_at=payment.processed_at,
+            error_message=payment.error_message,
+            gateway_response=payment.gateway_response,
+            updated_at=now,
+        )
+        return payment
 
-                order.status = Order.OrderStatus.CONFIRMED
-                order.version = F('version') + 1
-                order.save(update_fields=['status', 'version', 'updated_at'])
+    @staticmethod
+    def _release_order(order: Order, payment: Payment, now, any_version: bool = False) -> bool:
+        """
+        Return a claimed order to PENDING with a fresh pending payment
 
-            else:
-                payment.status = Payment.PaymentStatus.FAILED
-                payment.error_message = 'Payment processing failed'
-                payment.gateway_response = {'status': 'failed', 'message': 'Payment declined'}
-                payment.save(update_fields=['status', 'error_message', 'gateway_response', 'updated_at'])
+        Applies only while the order is still PROCESSING at the claimed
+        version, unless any_version is set by a caller that still holds the
+        claimed payment. The new payment copies the method, amount and
+        currency of the released one.
+        """
+        claimed_order = Order.objects.filter(pk=order.pk, status=Order.OrderStatus.PROCESSING)
+        if not any_version:
+            claimed_order = claimed_order.filter(version=order.version)
+        released = claimed_order.update(
+            status=Order.OrderStatus.PENDING,
+            version=F('version') + 1,
+            updated_at=now,
+        )
+        if not released:
+            return False
+
+        order.status = Order.OrderStatus.PENDING
+        order.version += 1
+        order.updated_at = now
+        Payment.objects.create(
+            order_id=order.pk,
+            transaction_id=OrderService.generate_transaction_id(),
+            payment_method=payment.payment_method,
+            amount=payment.amount,
+            currency=payment.currency,
+            status=Payment.PaymentStatus.PENDING,
+        )
+        return True
 
-                order.status = Order.OrderStatus.FAILED
-                order.save(update_fields=['status', 'updated_at'])
+    @staticmethod
+    def release_stale_payments(timeout: Optional[timedelta] = None) -> int:
+        """
+        Release orders whose payment claim outlived the processing timeout
 
-                raise PaymentProcessingError(_('Payment processing failed'))
+        Recovers orders left in PROCESSING by a worker that died between
+        claiming the payment and recording the gateway result. The claimed
+        payment is marked FAILED and the order returns to PENDING with a fresh
+        pending payment. A worker that finishes after its claim was released
+        finds its payment no longer PROCESSING and voids the charge.
 
-            payment.refresh_from_db()
-            order.refresh_from_db()
+        Args:
+            timeout: Age of a claim before it is released; defaults to
+                settings.PAYMENT_PROCESSING_TIMEOUT seconds
 
-            return payment
+        Returns:
+            Number of orders released
+        """
+        if timeout is None:
+            timeout = timedelta(seconds=settings.PAYMENT_PROCESSING_TIMEOUT)
+
+        now = timezone.now()
+        stale_orders = Order.objects.filter(
+            status=Order.OrderStatus.PROCESSING,
+            updated_at__lt=now - timeout,
+        ).only('id', 'status', 'version')
+
+        released = 0
+        for order in stale_orders:
+            with transaction.atomic():
+                # Payment rows are locked before the order, as in _finalize_payment
+                claimed = list(Payment.objects.select_for_update(of=('self',), no_key=True).filter(
+                    order=order,
+                    status=Payment.PaymentStatus.PROCESSING,
+                ).only('id', 'payment_method', 'amount', 'currency'))
+                template = claimed[0] if claimed else Payment.objects.filter(order=order).only(
+                    'id', 'payment_method', 'amount', 'currency'
+                ).order_by('-created_at').first()
+
+                if template is None or not OrderService._release_order(order, template, now):
+                    continue
+
+                Payment.objects.filter(pk__in=[payment.pk for payment in claimed]).update(
+                    status=Payment.PaymentStatus.FAILED,
+                    error_message='Payment timed out during processing',
+                    updated_at=now,
+                )
+                released += 1
 
-        except Order.DoesNotExist:
-            raise PaymentProcessingError(_('Order not found'))
-        except Exception as e:
-            raise PaymentProcessingError(f'Payment processing error: {str(e)}')
+        return released
 
     @staticmethod
     def _simulate_payment_processing(payment: Payment) -> bool:
@@ -250,6 +462,45 @@ class OrderService:
         """
         return True
 
+    @staticmethod
+    def _simulate_payment_void(payment: Payment) -> bool:
+        """
+        Simulate voiding a captured charge (placeholder for real payment gateway)
+
+        Paired with _simulate_payment_processing: a real integration reverses
+        the charge through the gateway that captured it and reports whether
+        the reversal succeeded.
+        """
+        return True
+
+    @staticmethod
+    def _void_charge(payment: Payment) -> None:
+        """
+        Void a captured charge that could not be applied to its order
+
+        The outcome is stored in the payment's gateway response; a failed void
+        is recorded so the charge can be refunded by hand.
+        """
+        try:
+            voided = OrderService._simulate_payment_void(payment)
+        except Exception:
+            voided = False
+
+        if voided:
+            payment.gateway_response = {'status': 'voided', 'message': 'Order changed before confirmation'}
+            Payment.objects.filter(pk=payment.pk).update(
+                gateway_response=payment.gateway_response,
+                updated_at=timezone.now(),
+            )
+        else:
+            payment.gateway_response = {'status': 'void_failed', 'message': 'Charge captured but not voided'}
+            payment.error_message = 'Charge could not be voided, a manual refund is required'
+            Payment.objects.filter(pk=payment.pk).update(
+                gateway_response=payment.gateway_response,
+                error_message=payment.error_message,
+                updated_at=timezone.now(),
+            )
+
     @staticmethod
     @transaction.atomic
     def cancel_order(order_id: str, reason: str = '') -> Order:
@@ -267,28 +518,39 @@ class OrderService:
             OrderProcessingError: If cancellation fails
         """
         try:
-            order = Order.objects.select_for_update().get(id=order_id)
+            # The full row is locked and read once: the returned order is
+            # updated in memory instead of being re-read after the UPDATEs
+            order = Order.objects.select_for_update(of=('self',), no_key=True).select_related(
+                'customer__user'
+            ).get(id=order_id)
 
             if not order.can_be_cancelled():
                 raise OrderProcessingError(
                     _('Order cannot be cancelled in current status: {}').format(order.status)
                 )
 
-            order.status = Order.OrderStatus.CANCELLED
-            if reason:
-                order.notes += f'\nCancellation reason: {reason}'
-            order.version = F('version') + 1
-            order.save(update_fields=['status', 'notes', 'version', 'updated_at'])
+            now = timezone.now()
+            note = f'\nCancellation reason: {reason}' if reason else ''
+            Order.objects.filter(pk=order.pk).update(
+                status=Order.OrderStatus.CANCELLED,
+                notes=Concat(F('notes'), Value(note), output_field=TextField()),
+                version=F('version') + 1,
+                updated_at=now,
+            )
 
             Payment.objects.filter(
                 order=order,
                 status__in=[Payment.PaymentStatus.PENDING, Payment.PaymentStatus.PROCESSING]
             ).update(
                 status=Payment.PaymentStatus.CANCELLED,
-                error_message='Order cancelled'
+                error_message='Order cancelled',
+                updated_at=now,
             )
 
-            order.refresh_from_db()
+            order.status = Order.OrderStatus.CANCELLED
+            order.notes += note
+            order.version += 1
+            order.updated_at = now
             return order
 
         except Order.DoesNotExist:
@@ -314,7 +576,9 @@ class OrderService:
             OrderProcessingError: If refund fails
         """
         try:
-            order = Order.objects.select_for_update().get(id=order_id)
+            order = Order.objects.select_for_update(of=('self',), no_key=True).only(
+                'id', 'status', 'version', 'total_amount'
+            ).get(id=order_id)
 
             if not order.can_be_refunded():
                 raise OrderProcessingError(
@@ -333,6 +597,7 @@ class OrderService:
             if not completed_payment:
                 raise OrderProcessingError(_('No completed payment found for this order'))
 
+            now = timezone.now()
             refund_transaction_id = OrderService.generate_transaction_id()
             Payment.objects.create(
                 order=order,
@@ -343,16 +608,17 @@ class OrderService:
                 status=Payment.PaymentStatus.REFUNDED,
                 payment_gateway=completed_payment.payment_gateway,
                 gateway_response={'status': 'refunded', 'reason': reason},
-                processed_at=timezone.now(),
+                processed_at=now,
             )
 
-            order.status = Order.OrderStatus.REFUNDED
-            order.notes += f'\nRefund reason: {reason}\nRefund amount: {refund_amount}'
-            order.version = F('version') + 1
-            order.save(update_fields=['status', 'notes', 'version', 'updated_at'])
-
-            order.refresh_from_db()
-            return order
+            note = f'\nRefund reason: {reason}\nRefund amount: {refund_amount}'
+            Order.objects.filter(pk=order.pk).update(
+                status=Order.OrderStatus.REFUNDED,
+                notes=Concat(F('notes'), Value(note), output_field=TextField()),
+                version=F('version') + 1,
+                updated_at=now,
+            )
+            return OrderService._get_order_for_response(order.pk)
 
         except Order.DoesNotExist:
             raise OrderProcessingError(_('Order not found'))
@@ -375,19 +641,22 @@ class OrderService:
             OrderProcessingError: If completion fails
         """
         try:
-            order = Order.objects.select_for_update().get(id=order_id)
+            order = Order.objects.select_for_update(of=('self',), no_key=True).only(
+                'id', 'status', 'version'
+            ).get(id=order_id)
 
             if order.status != Order.OrderStatus.CONFIRMED:
                 raise OrderProcessingError(
                     _('Only confirmed orders can be completed')
                 )
 
-            order.status = Order.OrderStatus.COMPLETED
-            order.version = F('version') + 1
-            order.save(update_fields=['status', 'version', 'updated_at'])
+            Order.objects.filter(pk=order.pk).update(
+                status=Order.OrderStatus.COMPLETED,
+                version=F('version') + 1,
+                updated_at=timezone.now(),
+            )
 
-            order.refresh_from_db()
-            return order
+            return OrderService._get_order_for_response(order.pk)
 
         except Order.DoesNotExist:
             raise OrderProcessingError(_('Order not found'))
@@ -4,9 +4,12 @@ from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.views import APIView
 from drf_spectacular.utils import extend_schema, OpenApiExample
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from django.utils.translation import gettext_lazy as _
 
-from apps.order.models import Customer, Order
+from apps.order.models import Customer, Order, OrderItem, Payment
 from apps.order.serializers import (
     CustomerSerializer,
     OrderSerializer,
@@ -23,6 +26,35 @@ from apps.order.services import (
     PaymentProcessingError,
 )
 
+# Detail actions that only need the order's identity before handing off to OrderService
+_STATE_TRANSITION_ACTIONS = ('process_payment', 'cancel', 'refund', 'complete')
+
+# Orders in these states only change through transitions that bump the version,
+# so the order-owned part of a response keyed on (id, version, status) stays
+# valid; the customer can still be edited and is always rendered fresh
+_TERMINAL_ORDER_STATUSES = (
+    Order.OrderStatus.COMPLETED,
+    Order.OrderStatus.CANCELLED,
+    Order.OrderStatus.REFUNDED,
+)
+_ORDER_RESPONSE_CACHE_TTL = 300
+
+
+def _order_prefetches():
+    """Prefetch the items and payments OrderSerializer renders"""
+    return (
+        Prefetch('items', queryset=OrderItem.objects.only(
+            'id', 'order', 'product_name', 'product_sku', 'quantity',
+            'unit_price', 'total_price', 'metadata',
+        ), to_attr='prefetched_items'),
+        Prefetch('payments', queryset=Payment.objects.defer('gateway_response'), to_attr='prefetched_payments'),
+    )
+
+
+def _with_order_relations(queryset):
+    """Join the customer and prefetch the items and payments OrderSerializer renders"""
+    return queryset.select_related('customer__user').prefetch_related(*_order_prefetches())
+
 
 class CustomerProfileView(APIView):
     """
@@ -87,37 +119,46 @@ class CustomerViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Customer CRUD operations
     """
-    queryset = Customer.objects.all()
+    queryset = Customer.objects.select_related('user')
     serializer_class = CustomerSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
         """Filter customers - staff can see all, users see only their own"""
+        queryset = getattr(self, '_cached_queryset', None)
+        if queryset is not None:
+            return queryset
+
         queryset = super().get_queryset()
         if self.request.user.is_authenticated and not self.request.user.is_staff:
             queryset = queryset.filter(user=self.request.user)
+        self._cached_queryset = queryset
         return queryset
 
     def perform_create(self, serializer):
         """Automatically link customer to authenticated user when creating"""
-        existing_customer = Customer.objects.filter(user=self.request.user).first()
-        if existing_customer:
-            raise serializers.ValidationError({
-                'user': _('You already have a customer profile. Use PUT/PATCH to update it.')
-            })
-
-        serializer.save(user=self.request.user)
+        self._save_linked_to_user(
+            serializer, _('You already have a customer profile. Use PUT/PATCH to update it.')
+        )
 
     def perform_update(self, serializer):
         """Ensure user link is maintained during update"""
-        serializer.save(user=self.request.user)
+        self._save_linked_to_user(serializer, _('This user already has a customer profile.'))
+
+    def _save_linked_to_user(self, serializer, duplicate_message):
+        """Save with the requesting user, relying on the unique user link to reject duplicates"""
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user)
+        except IntegrityError:
+            raise serializers.ValidationError({'user': duplicate_message})
 
 
 class OrderViewSet(viewsets.ModelViewSet):
     """
     ViewSet for Order operations with atomic transaction support
     """
-    queryset = Order.objects.all().prefetch_related('items', 'payments', 'customer')
+    queryset = Order.objects.all()
     serializer_class = OrderSerializer
 
     def get_permissions(self):
@@ -132,17 +173,48 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Filter orders based on user permissions"""
+        queryset = getattr(self, '_cached_queryset', None)
+        if queryset is not None:
+            return queryset
+
         queryset = super().get_queryset()
 
-        if self.request.user.is_staff:
-            return queryset.order_by('-created_at')
+        if self.action in _STATE_TRANSITION_ACTIONS:
+            queryset = queryset.only('id', 'status', 'version')
+        elif self.action == 'retrieve':
+            # Items and payments are prefetched only when the response is not cached
+            queryset = queryset.select_related('customer__user')
+        else:
+            queryset = _with_order_relations(queryset)
+
+        user = self.request.user
+        if user.is_staff:
+            queryset = queryset.order_by('-created_at')
+        elif user.is_authenticated:
+            queryset = queryset.filter(customer__user=user).order_by('-created_at')
+        else:
+            queryset = queryset.none()
+
+        self._cached_queryset = queryset
+        return queryset
+
+    def retrieve(self, request, *args, **kwargs):
+        """Get order details, serving terminal orders from the cache"""
+        order = self.get_object()
+        serializer = self.get_serializer(order)
 
-        if self.request.user.is_authenticated:
-            return queryset.filter(
-                customer__user=self.request.user
-            ).order_by('-created_at')
+        cacheable = order.status in _TERMINAL_ORDER_STATUSES
+        cache_key = f'order:{order.pk}:{order.version}:{order.status}'
+        data = cache.get(cache_key) if cacheable else None
 
-        return queryset.none()
+        if data is None:
+            prefetch_related_objects([order], *_order_prefetches())
+            data = serializer.data
+            if cacheable:
+                cache.set(cache_key, {**data, 'customer': None}, _ORDER_RESPONSE_CACHE_TTL)
+        else:
+            data['customer'] = serializer.fields['customer'].to_representation(order.customer)
+        return Response(data)
 
     @extend_schema(
         operation_id='create_order',
@@ -227,7 +299,7 @@ class OrderViewSet(viewsets.ModelViewSet):
     @extend_schema(
         operation_id='process_payment',
         summary='Process Payment',
-        description='Process payment for an order with race condition prevention using select_for_update',
+        description='Process payment for an order with race condition prevention using a payment row lock and optimistic order versioning',
         request=PaymentProcessSerializer,
         responses={
             200: PaymentSerializer,
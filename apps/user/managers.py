@@ -1,5 +1,17 @@
 from django.contrib.auth.models import BaseUserManager
 
+# Columns needed to list users; the password hash and session token stay deferred
+_LIST_FIELDS = (
+    'id',
+    'phone_number',
+    'first_name',
+    'last_name',
+    'email',
+    'is_verified',
+    'created_at',
+    'updated_at',
+)
+
 
 class UserManager(BaseUserManager):
     """
@@ -34,14 +46,20 @@ class UserManager(BaseUserManager):
 
         return self.create_user(phone_number, password, **extra_fields)
 
+    def invalidate_session(self, user_id):
+        """
+        Clear the stored token ID of a user with a single UPDATE
+        """
+        return self.filter(pk=user_id).update(current_token_id=None)
+
     def active_users(self):
         """
         Return queryset of all active users
         """
-        return self.filter(is_active=True)
+        return self.filter(is_active=True).only(*_LIST_FIELDS)
 
     def verified_users(self):
         """
         Return queryset of all verified users
         """
-        return self.filter(is_verified=True)
+        return self.filter(is_verified=True).only(*_LIST_FIELDS)
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.6 on 2026-10-15 01:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name="user",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(
+                    ("email__isnull", False), models.Q(("email", ""), _negated=True)
+                ),
+                fields=("email",),
+                name="unique_user_email",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.6 on 2026-10-15 01:33
+
+import re
+
+from django.db import migrations, models
+
+PHONE_NUMBER_RE = re.compile(r'998\d{9}')
+
+
+def normalize_phone_numbers(apps, schema_editor):
+    """
+    Bring numbers longer than 12 characters into the 998XXXXXXXXX form
+    before the column shrinks, and stop with a report for any that cannot be
+    """
+    User = apps.get_model("user", "User")
+    invalid = []
+    for user in User.objects.filter(phone_number__regex=r'^.{13,}$').only("id", "phone_number"):
+        digits = re.sub(r'\D', '', user.phone_number)
+        if len(digits) == 9:
+            digits = f'998{digits}'
+        if not PHONE_NUMBER_RE.fullmatch(digits) or User.objects.filter(phone_number=digits).exists():
+            invalid.append(f'{user.pk}: {user.phone_number!r}')
+            continue
+        User.objects.filter(pk=user.pk).update(phone_number=digits)
+
+    if invalid:
+        raise RuntimeError(
+            "These phone numbers do not fit in 12 characters and could not be "
+            "normalized; fix them and run the migration again:\n" + "\n".join(invalid)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0002_user_unique_email"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_phone_numbers, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="user",
+            name="phone_number",
+            field=models.CharField(
+                help_text="Phone number: 998931159963", max_length=12, unique=True
+            ),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.6 on 2026-10-15 01:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("user", "0003_user_phone_number_max_length"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                fields=["phone_number"],
+                include=("password", "current_token_id", "is_active", "is_verified"),
+                name="user_login_cover_idx",
+            ),
+        ),
+    ]
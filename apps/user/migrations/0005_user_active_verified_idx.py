@@ -0,0 +1,30 @@
+# Generated by Django 5.2.6 on 2026-10-15 01:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("user", "0004_user_login_cover_idx"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_active", True)),
+                fields=["is_active"],
+                name="user_active_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="user",
+            index=models.Index(
+                condition=models.Q(("is_verified", True)),
+                fields=["is_verified"],
+                name="user_verified_idx",
+            ),
+        ),
+    ]
@@ -1,4 +1,7 @@
+import re
+
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -6,6 +9,10 @@ from apps.base.models import BaseModel
 
 from .managers import UserManager
 
+# Uzbekistan numbers: country code 998 followed by nine digits
+PHONE_NUMBER_RE = re.compile(r'998\d{9}')
+PHONE_NUMBER_ERROR = _('Phone number must be 998 followed by 9 digits')
+
 
 class User(AbstractUser, BaseModel):
     """
@@ -13,7 +20,7 @@ class User(AbstractUser, BaseModel):
     """
 
     username = None
-    phone_number = models.CharField(max_length=20, unique=True, help_text="Phone number: 998931159963")
+    phone_number = models.CharField(max_length=12, unique=True, help_text="Phone number: 998931159963")
     first_name = models.CharField(max_length=150, blank=True)
     last_name = models.CharField(max_length=150, blank=True)
     email = models.EmailField(blank=True, null=True)
@@ -37,7 +44,12 @@ class User(AbstractUser, BaseModel):
                     'last_name',
                 ],
                 name='unique_user_identity'
-            )
+            ),
+            models.UniqueConstraint(
+                fields=['email'],
+                condition=Q(email__isnull=False) & ~Q(email=''),
+                name='unique_user_email'
+            ),
         ]
         indexes = [
             models.Index(
@@ -47,7 +59,22 @@ class User(AbstractUser, BaseModel):
                     'last_name'
                 ],
                 name='user_identity_idx'
-            )
+            ),
+            models.Index(
+                fields=['phone_number'],
+                include=['password', 'current_token_id', 'is_active', 'is_verified'],
+                name='user_login_cover_idx'
+            ),
+            models.Index(
+                fields=['is_active'],
+                condition=Q(is_active=True),
+                name='user_active_idx'
+            ),
+            models.Index(
+                fields=['is_verified'],
+                condition=Q(is_verified=True),
+                name='user_verified_idx'
+            ),
         ]
 
     def __str__(self):
@@ -63,26 +90,28 @@ class User(AbstractUser, BaseModel):
         """
         super().clean()
 
-        if self.phone_number and not self.phone_number.startswith('998'):
-            raise ValidationError({
-                'phone_number': _('Phone number must start with 998')
-            })
-        
-        if self.email and User.objects.filter(email=self.email).exclude(pk=self.pk).exists():
+        if self.phone_number and not PHONE_NUMBER_RE.fullmatch(self.phone_number):
             raise ValidationError({
-                'email': _('A user with this email already exists.')
+                'phone_number': PHONE_NUMBER_ERROR
             })
 
     def save(self, *args, **kwargs):
         """
         Override save to run clean validation
+
+        Uniqueness is left to the database constraints, and partial saves
+        with update_fields skip validation entirely.
         """
-        self.full_clean()
+        if not kwargs.get('update_fields'):
+            self.full_clean(validate_unique=False, validate_constraints=False)
         super().save(*args, **kwargs)
     
     def invalidate_all_sessions(self):
         """
         Invalidate all user sessions by clearing token ID
         """
+        from apps.base.auth import invalidate_cached_user
+
+        User.objects.invalidate_session(self.pk)
+        invalidate_cached_user(self.pk, self.current_token_id)
         self.current_token_id = None
-        self.save(update_fields=['current_token_id'])
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.utils.translation import gettext_lazy as _
-from apps.user.models import User
+from apps.user.models import PHONE_NUMBER_ERROR, PHONE_NUMBER_RE, User
 
 
 class RefreshTokenSerializer(serializers.Serializer):
@@ -39,7 +39,7 @@ class AuthErrorSerializer(serializers.Serializer):
 
 
 class PasswordLoginSerializer(serializers.Serializer):
-    phone_number = serializers.CharField(max_length=20, help_text="Phone number: 998931159963")
+    phone_number = serializers.CharField(max_length=12, help_text="Phone number: 998931159963")
     password = serializers.CharField(help_text="User password")
 
 
@@ -51,7 +51,7 @@ class PasswordLoginResponseSerializer(serializers.Serializer):
 
 class SignupSerializer(serializers.Serializer):
     phone_number = serializers.CharField(
-        max_length=20,
+        max_length=12,
         help_text="Phone number: 998931159963"
     )
     password = serializers.CharField(
@@ -83,19 +83,9 @@ class SignupSerializer(serializers.Serializer):
     )
 
     def validate_phone_number(self, value):
-        """Validate phone number format and uniqueness"""
-        if not value.startswith('998'):
-            raise serializers.ValidationError(_('Phone number must start with 998'))
-
-        if User.objects.filter(phone_number=value).exists():
-            raise serializers.ValidationError(_('A user with this phone number already exists'))
-
-        return value
-
-    def validate_email(self, value):
-        """Validate email uniqueness if provided"""
-        if value and User.objects.filter(email=value).exists():
-            raise serializers.ValidationError(_('A user with this email already exists'))
+        """Validate phone number format; uniqueness is enforced by the database"""
+        if not PHONE_NUMBER_RE.fullmatch(value):
+            raise serializers.ValidationError(PHONE_NUMBER_ERROR)
 
         return value
 
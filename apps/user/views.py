@@ -1,7 +1,7 @@
-from rest_framework import status
+from rest_framework import serializers, status
 from apps.user.models import User
 from rest_framework.views import APIView
-from apps.base.auth import JWTTokenGenerator
+from apps.base.auth import JWTTokenGenerator, invalidate_cached_user
 from rest_framework.response import Response
 from drf_spectacular.utils import extend_schema, OpenApiExample
 from rest_framework.permissions import AllowAny, IsAuthenticated
@@ -11,8 +11,73 @@ from apps.user.serializers import (
     AuthErrorSerializer, PasswordLoginSerializer, PasswordLoginResponseSerializer,
     SignupSerializer, SignupResponseSerializer,
 )
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
 from django.utils.translation import gettext_lazy as _
 
+# Columns read by password login: the hash, the token id and the profile it returns
+_LOGIN_USER_FIELDS = (
+    'id', 'password', 'phone_number', 'first_name', 'last_name', 'email',
+    'is_active', 'is_verified', 'current_token_id', 'created_at', 'updated_at',
+)
+
+# Shared field used to render timestamps exactly as the response serializers would
+_datetime_field = serializers.DateTimeField()
+
+_INVALID_CREDENTIALS = _('Invalid phone number or password')
+_INVALID_REFRESH_TOKEN = _('Invalid refresh token')
+_REFRESH_TOKEN_SUPERSEDED = _('Refresh token has been invalidated by new login')
+_USER_NOT_FOUND = _('User not found')
+_LOGGED_OUT = _('Successfully logged out')
+
+_DUPLICATE_USER_ERRORS = {
+    'phone_number': _('A user with this phone number already exists'),
+    'email': _('A user with this email already exists'),
+}
+_DUPLICATE_USER = _('A user with these details already exists')
+
+# Named User constraints and the signup field each one protects
+_DUPLICATE_USER_CONSTRAINTS = {
+    'unique_user_email': 'email',
+    'unique_user_identity': 'phone_number',
+}
+
+
+def _duplicate_user_field(error, phone_number, email):
+    """
+    Return the signup field whose uniqueness rejected the new user, if known
+
+    PostgreSQL reports the violated constraint by name. Other backends, and
+    the unnamed unique index on phone_number, fall back to looking up the
+    colliding row.
+    """
+    diag = getattr(error.__cause__, 'diag', None)
+    field = _DUPLICATE_USER_CONSTRAINTS.get(getattr(diag, 'constraint_name', None))
+    if field:
+        return field
+    if email and User.objects.filter(email=email).exists():
+        return 'email'
+    if User.objects.filter(phone_number=phone_number).exists():
+        return 'phone_number'
+    return None
+
+
+def _user_payload(user) -> dict:
+    """
+    Render a user exactly as UserProfileSerializer would, without the serializer
+    """
+    return {
+        'id': str(user.id),
+        'phone_number': user.phone_number,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'email': user.email,
+        'is_active': user.is_active,
+        'is_verified': user.is_verified,
+        'created_at': _datetime_field.to_representation(user.created_at),
+        'updated_at': _datetime_field.to_representation(user.updated_at),
+    }
+
 
 class SignupView(APIView):
     """
@@ -72,29 +137,28 @@ class SignupView(APIView):
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        user = serializer.save()
+        try:
+            with transaction.atomic():
+                user = serializer.save()
+        except IntegrityError as e:
+            field = _duplicate_user_field(
+                e, serializer.validated_data['phone_number'], serializer.validated_data.get('email')
+            )
+            if field is None:
+                return Response({'non_field_errors': [_DUPLICATE_USER]}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({field: [_DUPLICATE_USER_ERRORS[field]]}, status=status.HTTP_400_BAD_REQUEST)
+        except ValidationError as e:
+            return Response(e.message_dict, status=status.HTTP_400_BAD_REQUEST)
 
-        token = JWTTokenGenerator.generate_token(user)
-        refresh_token = JWTTokenGenerator.generate_refresh_token(user)
+        token, refresh_token = JWTTokenGenerator.generate_token_pair(user)
 
         response_data = {
             'access_token': token,
             'refresh_token': refresh_token,
-            'user': {
-                'id': str(user.id),
-                'phone_number': user.phone_number,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'is_active': user.is_active,
-                'is_verified': user.is_verified,
-                'created_at': user.created_at,
-                'updated_at': user.updated_at,
-            }
+            'user': _user_payload(user),
         }
 
-        response_serializer = SignupResponseSerializer(response_data)
-        return Response(response_serializer.data, status=status.HTTP_201_CREATED)
+        return Response(response_data, status=status.HTTP_201_CREATED)
 
 
 class LoginView(APIView):
@@ -155,41 +219,26 @@ class LoginView(APIView):
         phone_number = serializer.validated_data['phone_number']
         password = serializer.validated_data['password']
 
-        try:
-            user = User.objects.get(phone_number=phone_number)
-            if not user.check_password(password):
-                return Response(
-                    {'error': _('Invalid phone number or password')}, 
-                    status=status.HTTP_401_UNAUTHORIZED
-                )
-
-        except User.DoesNotExist:
+        user = User.objects.only(*_LOGIN_USER_FIELDS).filter(phone_number=phone_number).first()
+        if user is None:
+            # Run the password hasher anyway so a missing user takes as long
+            # as a wrong password.
+            User().set_password(password)
+        if user is None or not user.check_password(password):
             return Response(
-                {'error': _('Invalid phone number or password')}, 
+                {'error': _INVALID_CREDENTIALS},
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
-        token = JWTTokenGenerator.generate_token(user)
-        refresh_token = JWTTokenGenerator.generate_refresh_token(user)
+        token, refresh_token = JWTTokenGenerator.generate_token_pair(user)
         
         response_data = {
             'access_token': token,
             'refresh_token': refresh_token,
-            'user': {
-                'id': str(user.id),
-                'phone_number': user.phone_number,
-                'first_name': user.first_name,
-                'last_name': user.last_name,
-                'email': user.email,
-                'is_active': user.is_active,
-                'is_verified': user.is_verified,
-                'created_at': user.created_at,
-                'updated_at': user.updated_at,
-            }
+            'user': _user_payload(user),
         }
-        
-        response_serializer = PasswordLoginResponseSerializer(response_data)
-        return Response(response_serializer.data)
+
+        return Response(response_data)
 
 
 class RefreshTokenView(APIView):
@@ -241,31 +290,26 @@ class RefreshTokenView(APIView):
         
         if not payload or payload.get('type') != 'refresh':
             return Response(
-                {'error': _('Invalid refresh token')}, 
+                {'error': _INVALID_REFRESH_TOKEN}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
         try:
-            user = User.objects.get(id=payload['user_id'])
+            user = User.objects.only('id', 'phone_number', 'current_token_id').get(id=payload['user_id'])
 
             token_id = payload.get('token_id')
             if user.current_token_id != token_id:
                 return Response(
-                    {'error': _('Refresh token has been invalidated by new login')}, 
+                    {'error': _REFRESH_TOKEN_SUPERSEDED}, 
                     status=status.HTTP_401_UNAUTHORIZED
                 )
             
             new_token = JWTTokenGenerator.generate_token(user)
-            
-            response_data = {
-                'access_token': new_token,
-            }
-            
-            response_serializer = RefreshResponseSerializer(response_data)
-            return Response(response_serializer.data)
+
+            return Response({'access_token': new_token})
         except User.DoesNotExist:
             return Response(
-                {'error': _('User not found')}, 
+                {'error': _USER_NOT_FOUND}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
 
@@ -298,16 +342,10 @@ class LogoutView(APIView):
         ]
     )
     def post(self, request):
-        user = request.user
-        user.current_token_id = None
-        user.save(update_fields=['current_token_id'])
-        
-        response_data = {
-            'message': _('Successfully logged out')
-        }
-        
-        response_serializer = LogoutResponseSerializer(response_data)
-        return Response(response_serializer.data)
+        User.objects.invalidate_session(request.user.pk)
+        invalidate_cached_user(request.user.pk, request.user.current_token_id)
+
+        return Response({'message': _LOGGED_OUT})
 
 
 class ProfileView(APIView):
@@ -346,5 +384,4 @@ class ProfileView(APIView):
     )
     def get(self, request):
         user = request.user
-        serializer = UserProfileSerializer(user)
-        return Response(serializer.data)
+        return Response(_user_payload(user))
@@ -0,0 +1,23 @@
+from importlib import import_module
+
+from django.urls import path
+
+
+def _docs_view(name):
+    """
+    Resolve a view from core.docs_views on its first request, so
+    drf_spectacular's views, generator and renderers are not imported
+    when the URLconf loads
+    """
+    def view(request, *args, **kwargs):
+        return getattr(import_module("core.docs_views"), name)(request, *args, **kwargs)
+
+    view.csrf_exempt = True
+    return view
+
+
+urlpatterns = [
+    path("schema/", _docs_view("schema_view"), name="schema"),
+    path("docs/", _docs_view("redoc_view"), name="redoc"),
+    path("docs/swagger/", _docs_view("swagger_view"), name="swagger-ui"),
+]
@@ -0,0 +1,36 @@
+from django.core.cache import cache
+from django.utils import translation
+from drf_spectacular.views import (
+    SpectacularAPIView,
+    SpectacularRedocView,
+    SpectacularSwaggerView,
+)
+from rest_framework.response import Response
+
+# The schema only changes on deploy, so it is built once per cache period
+_SCHEMA_CACHE_TIMEOUT = 60 * 60
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    Schema view that caches the generated schema, not the rendered response,
+    so YAML and JSON are still negotiated per request
+    """
+
+    def _get_schema_response(self, request):
+        version = self.api_version or request.version or self._get_version_parameter(request)
+        cache_key = f'openapi-schema:{version}:{translation.get_language()}'
+        schema = cache.get(cache_key)
+        if schema is None:
+            generator = self.generator_class(urlconf=self.urlconf, api_version=version, patterns=self.patterns)
+            schema = generator.get_schema(request=request, public=self.serve_public)
+            cache.set(cache_key, schema, _SCHEMA_CACHE_TIMEOUT)
+        return Response(
+            data=schema,
+            headers={"Content-Disposition": f'inline; filename="{self._get_filename(request, version)}"'}
+        )
+
+
+schema_view = CachedSchemaView.as_view()
+redoc_view = SpectacularRedocView.as_view(url_name="schema")
+swagger_view = SpectacularSwaggerView.as_view(url_name="schema")
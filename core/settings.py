@@ -87,24 +87,27 @@ WSGI_APPLICATION = "core.wsgi.application"
 ### DATABASES CONFIGURATION ###
 ###############################
 
-# if config('DEV', default=True, cast=bool) == True:
-#     DATABASES = {
-#         'default': {
-#             'ENGINE': 'django.db.backends.postgresql_psycopg2',
-#             'NAME': config('DB_NAME', default='test_db'),
-#             'USER': config('DB_USER', default='user'),
-#             'PASSWORD': config('DB_PASSWORD', default='password'),
-#             'HOST': config('DB_HOST', default='localhost'),
-#             'PORT': config('DB_PORT', default='5432'),
-#         }
-#     }
-# else:
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+if config('DEV', default=False, cast=bool):
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': config('DB_NAME', default='test_db'),
+            'USER': config('DB_USER', default='user'),
+            'PASSWORD': config('DB_PASSWORD', default='password'),
+            'HOST': config('DB_HOST', default='localhost'),
+            'PORT': config('DB_PORT', default='5432'),
+            # Reuse connections across requests instead of reconnecting each time
+            'CONN_MAX_AGE': config('CONN_MAX_AGE', default=60, cast=int),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
 
 
 # Password validation
@@ -126,6 +129,12 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Stored hashes are all PBKDF2 (no argon2/bcrypt dependency is installed), so
+# a single hasher keeps identify_hasher a direct lookup
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+]
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -145,6 +154,15 @@ USE_TZ = True
 STATIC_URL = "static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "whitenoise.storage.CompressedManifestStaticFilesStorage",
+    },
+}
+
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
@@ -164,6 +182,26 @@ AUTH_USER_MODEL = 'user.User'
 
 REDIS_URL = config('REDIS_URL', default='redis://localhost:6379/0')
 
+# Shared by every worker process: cached auth users are invalidated on login and
+# logout, and that must reach the workers serving the user's other requests.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    }
+}
+
+
+#############################
+### PAYMENT CONFIGURATION ###
+#############################
+
+# Off until a real gateway is wired in: payments are accepted without a gateway call
+PAYMENT_GATEWAY_ENABLED = config('PAYMENT_GATEWAY_ENABLED', default=False, cast=bool)
+
+# Seconds a payment may stay at the gateway before release_stale_payments returns its order to PENDING
+PAYMENT_PROCESSING_TIMEOUT = config('PAYMENT_PROCESSING_TIMEOUT', default=300, cast=int)
+
 
 ###########################
 ### CORS CONFIGURATION ####
@@ -209,4 +247,5 @@ SPECTACULAR_SETTINGS = {
     "SCHEMA_PATH_PREFIX": r"/api/v[0-9]",
     "COMPONENT_SPLIT_REQUEST": True,
     "COMPONENT_NO_READ_ONLY_REQUIRED": True,
+    "DISABLE_ERRORS_AND_WARNINGS": True,
 }
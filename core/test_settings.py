@@ -0,0 +1,20 @@
+from core.settings import *  # noqa: F401,F403
+
+# Test passwords only need to round-trip; skip the deliberately slow hasher
+PASSWORD_HASHERS = [
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+]
+
+# Tests run without a Redis server; each xdist worker gets its own cache
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# SQLite test databases live in memory; skip journaling and fsync as well.
+# Run with DEV=True to test against PostgreSQL instead.
+if DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":  # noqa: F405
+    DATABASES["default"]["OPTIONS"] = {  # noqa: F405
+        "init_command": "PRAGMA journal_mode=MEMORY; PRAGMA synchronous=OFF;",
+    }
@@ -1,18 +1,25 @@
 import os
 import django
+from django.db import IntegrityError, connection, transaction
 from django.core.management import call_command
 from django.contrib.auth import get_user_model
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "core.settings")
 django.setup()
 
-# Run migrations
-call_command("migrate", interactive=False)
-print("✅ Migrations applied successfully!")
+# Open the connection once; every step below reuses it
+connection.ensure_connection()
 
-# Collect static files
-call_command("collectstatic", verbosity=0, clear=True, no_input=True)
-print("✅ Static files collected successfully!")
+# Run migrations (skipped when a separate release job already applied them)
+if os.environ.get("MIGRATIONS_APPLIED") != "1":
+    call_command("migrate", interactive=False)
+    print("✅ Migrations applied successfully!")
+
+# Collect static files; the manifest storage needs them before any page renders.
+# Skipped when a build step already ran collectstatic (STATIC_COLLECTED=1).
+if os.environ.get("STATIC_COLLECTED") != "1":
+    call_command("collectstatic", verbosity=0, no_input=True)
+    print("✅ Static files collected successfully!")
 
 
 # Create superuser if not exists
@@ -20,11 +27,12 @@ USERNAME = os.environ.get("USERNAME", "998901002030")
 SUPERUSER_PASSWORD = os.environ.get("SUPERUSER_PASSWORD", "password")
 
 User = get_user_model()
-if not User.objects.filter(phone_number=USERNAME).exists():
-    User.objects.create_superuser(
-        phone_number=USERNAME,
-        password=SUPERUSER_PASSWORD
-    )
+try:
+    with transaction.atomic():
+        User.objects.create_superuser(
+            phone_number=USERNAME,
+            password=SUPERUSER_PASSWORD
+        )
     print("✅ Superuser created successfully!")
-else:
+except IntegrityError:
     print("ℹ️ Superuser already exists.")
@@ -1,40 +1,76 @@
 import pytest
 from decimal import Decimal
 from django.contrib.auth import get_user_model
+from django.db import transaction
 
+from apps.base.auth import JWTTokenGenerator
 from apps.order.models import Customer, Order, OrderItem, Payment
+from tests.factories import AdminUserFactory, UserFactory
 
 User = get_user_model()
 
+_SHIPPING_COST = Decimal('5.00')
+_LAPTOP_PRICE = Decimal('1000.00')
+_MOUSE_PRICE = Decimal('25.00')
 
-@pytest.fixture
-def user(db):
-    """Create a test user"""
-    return User.objects.create_user(
-        phone_number='998901234567',
-        password='testpass123',
-        first_name='Test',
-        last_name='User',
-        email='test@example.com',
-        is_verified=True,
-    )
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """
+    Start every test with empty application caches
+
+    Cached users, decoded tokens and rendered responses would otherwise
+    outlive the rolled-back rows they were built from.
+    """
+    from django.core.cache import cache
+    from apps.base import auth
+
+    cache.clear()
+    auth._payload_cache.clear()
+    auth._basic_auth_cache.clear()
+    auth._jwt_secret.cache_clear()
+
+
+_USER_PHONE_NUMBER = '998901234567'
+_ADMIN_PHONE_NUMBER = '998900000000'
+
+
+@pytest.fixture(scope='session')
+def _shared_users(django_db_setup, django_db_blocker):
+    """
+    Create the test user and admin once per session
+
+    Each test runs inside a transaction that is rolled back, so changes made
+    to these rows never leak into the next test.
+    """
+    with django_db_blocker.unblock():
+        with transaction.atomic():
+            # get_or_create: a reused test database may still hold the rows of an interrupted run
+            user = UserFactory(phone_number=_USER_PHONE_NUMBER, email='test@example.com')
+            admin_user = AdminUserFactory(phone_number=_ADMIN_PHONE_NUMBER, email='admin@example.com')
+            # Signed once: the stored token id survives every rolled-back test
+            user_token = JWTTokenGenerator.generate_token(user)
+
+    yield user.pk, admin_user.pk, user_token
+
+    with django_db_blocker.unblock():
+        User.objects.filter(pk__in=[user.pk, admin_user.pk]).delete()
 
 
 @pytest.fixture
-def admin_user(db):
-    """Create an admin user"""
-    return User.objects.create_superuser(
-        phone_number='998900000000',
-        password='adminpass123',
-        first_name='Admin',
-        last_name='User',
-        email='admin@example.com',
-    )
+def user(db, _shared_users):
+    """Return the shared test user"""
+    return User.objects.get(pk=_shared_users[0])
 
 
 @pytest.fixture
-def customer(db, user):
-    """Create a test customer linked to user"""
+def admin_user(db, _shared_users):
+    """Return the shared admin user"""
+    return User.objects.get(pk=_shared_users[1])
+
+
+def _create_customer(user):
+    """Create the standard test customer linked to user"""
     return Customer.objects.create(
         user=user,
         email='customer@example.com',
@@ -47,6 +83,67 @@ def customer(db, user):
     )
 
 
+def _create_order(customer):
+    """Create the standard test order with two items"""
+    order = Order.objects.create(
+        customer=customer,
+        order_number='ORD-20250109-TEST01',
+        status=Order.OrderStatus.PENDING,
+        shipping_address='123 Test Street, Tashkent',
+        shipping_cost=_SHIPPING_COST,
+        notes='Test order',
+    )
+
+    OrderItem.objects.bulk_create([
+        OrderItem(
+            order=order,
+            product_name='Test Laptop',
+            product_sku='LAP-001',
+            quantity=1,
+            unit_price=_LAPTOP_PRICE,
+            total_price=_LAPTOP_PRICE,
+        ),
+        OrderItem(
+            order=order,
+            product_name='Test Mouse',
+            product_sku='MOU-001',
+            quantity=2,
+            unit_price=_MOUSE_PRICE,
+            total_price=_MOUSE_PRICE * 2,
+        ),
+    ])
+
+    order.calculate_totals()
+    order.save(update_fields=['subtotal', 'tax_amount', 'total_amount'])
+
+    return order
+
+
+def _create_payment(order):
+    """Create a pending payment for order"""
+    return Payment.objects.create(
+        order=order,
+        transaction_id='TXN-20250109-TEST01',
+        payment_method=Payment.PaymentMethod.CREDIT_CARD,
+        amount=order.total_amount,
+        status=Payment.PaymentStatus.PENDING,
+    )
+
+
+@transaction.atomic
+def _create_order_graph(user):
+    """Create customer, order, items and payment in a single transaction"""
+    customer = _create_customer(user)
+    order = _create_order(customer)
+    return customer, order, _create_payment(order)
+
+
+@pytest.fixture
+def customer(db, user):
+    """Create a test customer linked to user"""
+    return _create_customer(user)
+
+
 @pytest.fixture
 def guest_customer(db):
     """Create a guest customer (no user link)"""
@@ -63,49 +160,48 @@ def guest_customer(db):
 @pytest.fixture
 def order(db, customer):
     """Create a test order"""
-    order = Order.objects.create(
-        customer=customer,
-        order_number='ORD-20250109-TEST01',
-        status=Order.OrderStatus.PENDING,
-        shipping_address='123 Test Street, Tashkent',
-        shipping_cost=Decimal('5.00'),
-        notes='Test order',
-    )
+    return _create_order(customer)
 
-    OrderItem.objects.create(
-        order=order,
-        product_name='Test Laptop',
-        product_sku='LAP-001',
-        quantity=1,
-        unit_price=Decimal('1000.00'),
-        total_price=Decimal('1000.00'),
-    )
 
-    OrderItem.objects.create(
-        order=order,
-        product_name='Test Mouse',
-        product_sku='MOU-001',
-        quantity=2,
-        unit_price=Decimal('25.00'),
-        total_price=Decimal('50.00'),
-    )
+@pytest.fixture
+def payment(db, order):
+    """Create a test payment"""
+    return _create_payment(order)
 
-    order.calculate_totals()
-    order.save()
 
-    return order
+@pytest.fixture(scope='class')
+def _class_customer(django_db_setup, django_db_blocker, _shared_users):
+    """
+    Create the user's customer once for a whole test class
 
+    Changes made by a test are rolled back with the test transaction.
+    """
+    with django_db_blocker.unblock():
+        customer = _create_customer(User.objects.get(pk=_shared_users[0]))
 
-@pytest.fixture
-def payment(db, order):
-    """Create a test payment"""
-    return Payment.objects.create(
-        order=order,
-        transaction_id='TXN-20250109-TEST01',
-        payment_method=Payment.PaymentMethod.CREDIT_CARD,
-        amount=order.total_amount,
-        status=Payment.PaymentStatus.PENDING,
-    )
+    yield customer.pk
+
+    with django_db_blocker.unblock():
+        customer.delete()
+
+
+@pytest.fixture(scope='class')
+def _class_order(django_db_setup, django_db_blocker, _shared_users):
+    """
+    Create one customer, order and payment for a whole test class
+
+    Tests get fresh copies through their own fixtures and every change they
+    make is rolled back with the test transaction.
+    """
+    with django_db_blocker.unblock():
+        customer, order, payment = _create_order_graph(User.objects.get(pk=_shared_users[0]))
+
+    yield customer.pk, order.pk, payment.pk
+
+    with django_db_blocker.unblock():
+        Payment.objects.filter(order_id=order.pk).delete()
+        order.delete()
+        customer.delete()
 
 
 @pytest.fixture
@@ -117,19 +213,20 @@ def api_client():
 
 @pytest.fixture
 def authenticated_client(api_client, user):
-    """Create authenticated API client"""
-    from apps.base.auth import JWTTokenGenerator
-
-    token = JWTTokenGenerator.generate_token(user)
-    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    """Create API client authenticated as user, bypassing JWT"""
+    api_client.force_authenticate(user=user)
     return api_client
 
 
 @pytest.fixture
 def admin_client(api_client, admin_user):
-    """Create admin authenticated API client"""
-    from apps.base.auth import JWTTokenGenerator
+    """Create API client authenticated as admin, bypassing JWT"""
+    api_client.force_authenticate(user=admin_user)
+    return api_client
 
-    token = JWTTokenGenerator.generate_token(admin_user)
-    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+@pytest.fixture
+def jwt_authenticated_client(api_client, user, _shared_users):
+    """Create API client authenticated as user with a real bearer token"""
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {_shared_users[2]}')
     return api_client
@@ -0,0 +1,57 @@
+import factory
+from decimal import Decimal
+from django.contrib.auth import get_user_model
+from factory.django import DjangoModelFactory, Password
+
+from apps.order.models import Customer, Order
+
+
+class UserFactory(DjangoModelFactory):
+    """Verified user, fetched instead of duplicated when the phone number exists"""
+
+    class Meta:
+        model = get_user_model()
+        django_get_or_create = ('phone_number',)
+
+    phone_number = factory.Sequence(lambda n: f'998904{n:06d}')
+    password = Password('testpass123')
+    first_name = 'Test'
+    last_name = 'User'
+    email = factory.Sequence(lambda n: f'user{n}@example.com')
+    is_verified = True
+
+
+class AdminUserFactory(UserFactory):
+    """Superuser"""
+
+    password = Password('adminpass123')
+    first_name = 'Admin'
+    is_staff = True
+    is_superuser = True
+
+
+class CustomerFactory(DjangoModelFactory):
+    """Guest customer; pass user= to link one"""
+
+    class Meta:
+        model = Customer
+
+    email = factory.Sequence(lambda n: f'customer{n}@example.com')
+    full_name = 'Factory Customer'
+    phone_number = factory.Sequence(lambda n: f'998903{n:06d}')
+    address = '1 Factory Street'
+    city = 'Tashkent'
+    country = 'Uzbekistan'
+
+
+class OrderFactory(DjangoModelFactory):
+    """Pending order without items"""
+
+    class Meta:
+        model = Order
+
+    customer = factory.SubFactory(CustomerFactory)
+    order_number = factory.Sequence(lambda n: f'ORD-FACTORY-{n:06d}')
+    status = Order.OrderStatus.PENDING
+    shipping_address = '1 Factory Street, Tashkent'
+    shipping_cost = Decimal('5.00')
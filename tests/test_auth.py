@@ -0,0 +1,197 @@
+import base64
+import pytest
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from redis.exceptions import RedisError
+from rest_framework.test import APIRequestFactory
+from rest_framework.exceptions import AuthenticationFailed
+
+from apps.base import auth
+from apps.base.auth import BasicAuth, JWTAuthentication, JWTTokenGenerator
+
+User = get_user_model()
+
+
+def _request_with_token(token):
+    return APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+
+@pytest.mark.django_db
+class TestJWTAuthentication:
+    """Test JWTAuthentication"""
+
+    def test_authenticate_valid_token(self, user):
+        """Test valid token authenticates the user"""
+        token = JWTTokenGenerator.generate_token(user)
+
+        authenticated_user, raw_token = JWTAuthentication().authenticate(_request_with_token(token))
+
+        assert authenticated_user.id == user.id
+        assert raw_token == token
+
+    def test_authenticate_without_header(self):
+        """Test request without bearer header is skipped"""
+        request = APIRequestFactory().get('/')
+
+        assert JWTAuthentication().authenticate(request) is None
+
+    def test_repeated_token_skips_decode(self, user):
+        """Test repeated requests with the same token reuse the decoded payload"""
+        token = JWTTokenGenerator.generate_token(user)
+        JWTAuthentication().authenticate(_request_with_token(token))
+
+        with mock.patch.object(auth._JWT, 'decode', side_effect=AssertionError('decoded again')):
+            authenticated_user, _ = JWTAuthentication().authenticate(_request_with_token(token))
+
+        assert authenticated_user.id == user.id
+
+    def test_invalid_token_is_not_cached(self):
+        """Test invalid tokens are rejected and never cached"""
+        cache_size = len(auth._payload_cache)
+
+        with pytest.raises(AuthenticationFailed):
+            JWTAuthentication().authenticate(_request_with_token('not-a-jwt'))
+
+        assert len(auth._payload_cache) == cache_size
+
+    def test_token_invalidated_by_new_login(self, user):
+        """Test old token is rejected after a new login"""
+        old_token = JWTTokenGenerator.generate_token(user)
+        JWTAuthentication().authenticate(_request_with_token(old_token))
+
+        JWTTokenGenerator.generate_token(user)
+
+        with pytest.raises(AuthenticationFailed):
+            JWTAuthentication().authenticate(_request_with_token(old_token))
+
+    def test_token_for_deleted_user(self, user):
+        """Test token of a deleted user is rejected"""
+        token = JWTTokenGenerator.generate_token(user)
+        user.delete()
+
+        with pytest.raises(AuthenticationFailed, match='User not found'):
+            JWTAuthentication().authenticate(_request_with_token(token))
+
+    def test_cached_user_skips_database(self, user, django_assert_num_queries):
+        """Test repeated requests reuse the cached user without a SELECT"""
+        token = JWTTokenGenerator.generate_token(user)
+        JWTAuthentication().authenticate(_request_with_token(token))
+
+        with django_assert_num_queries(0):
+            authenticated_user, _ = JWTAuthentication().authenticate(_request_with_token(token))
+
+        assert authenticated_user.id == user.id
+
+    def test_new_login_rejects_old_token_immediately(self, api_client, user):
+        """Test a cached session stops authenticating as soon as the user logs in again"""
+        old_token = JWTTokenGenerator.generate_token(user)
+        JWTAuthentication().authenticate(_request_with_token(old_token))
+
+        data = {'phone_number': user.phone_number, 'password': 'testpass123'}
+        response = api_client.post(reverse('login'), data, format='json')
+        new_token = response.data['access_token']
+
+        with pytest.raises(AuthenticationFailed):
+            JWTAuthentication().authenticate(_request_with_token(old_token))
+        authenticated_user, _ = JWTAuthentication().authenticate(_request_with_token(new_token))
+        assert authenticated_user.id == user.id
+
+    def test_in_flight_request_cannot_recache_ended_session(self, user):
+        """Test a request that loaded the user before logout cannot revive the old token"""
+        token = JWTTokenGenerator.generate_token(user)
+        stale_user = User.objects.get(pk=user.pk)
+
+        def load_then_logout(**kwargs):
+            user.invalidate_all_sessions()
+            return stale_user
+
+        with mock.patch.object(User.objects, 'only') as only:
+            only.return_value.get.side_effect = load_then_logout
+            JWTAuthentication().authenticate(_request_with_token(token))
+
+        with pytest.raises(AuthenticationFailed):
+            JWTAuthentication().authenticate(_request_with_token(token))
+
+    def test_cache_outage_falls_back_to_database(self, user):
+        """Test authentication still works when the cache backend is unreachable"""
+        token = JWTTokenGenerator.generate_token(user)
+
+        with mock.patch.object(auth.cache, 'get', side_effect=RedisError), \
+                mock.patch.object(auth.cache, 'add', side_effect=RedisError):
+            authenticated_user, _ = JWTAuthentication().authenticate(_request_with_token(token))
+
+        assert authenticated_user.id == user.id
+
+    def test_logout_invalidates_cached_user(self, api_client, user):
+        """Test token is rejected right after logout even if the user was cached"""
+        token = JWTTokenGenerator.generate_token(user)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+        assert api_client.get(reverse('profile')).status_code == 200
+        assert api_client.post(reverse('logout')).status_code == 200
+        assert api_client.get(reverse('profile')).status_code == 401
+
+
+@pytest.mark.django_db
+class TestBasicAuth:
+    """Test BasicAuth"""
+
+    def _request(self, phone_number, password):
+        credentials = base64.b64encode(f'{phone_number}:{password}'.encode()).decode()
+        return APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+
+    def test_authenticate_valid_credentials(self, user):
+        """Test valid phone number and password authenticate"""
+        authenticated_user, _ = BasicAuth().authenticate(self._request(user.phone_number, 'testpass123'))
+
+        assert authenticated_user.id == user.id
+
+    def test_authenticate_wrong_password(self, user):
+        """Test wrong password is rejected"""
+        assert BasicAuth().authenticate(self._request(user.phone_number, 'wrong')) is None
+
+    def test_authenticate_unknown_user_still_hashes(self, db):
+        """Test unknown users still run the password hasher"""
+        with mock.patch.object(auth.User, 'set_password') as set_password:
+            assert BasicAuth().authenticate(self._request('998000000001', 'secret')) is None
+
+        set_password.assert_called_once_with('secret')
+
+    def test_repeated_credentials_skip_hashing(self, user):
+        """Test repeated valid credentials reuse the recent password check"""
+        BasicAuth().authenticate(self._request(user.phone_number, 'testpass123'))
+
+        with mock.patch.object(auth, 'check_password', side_effect=AssertionError('hashed again')):
+            authenticated_user, _ = BasicAuth().authenticate(self._request(user.phone_number, 'testpass123'))
+
+        assert authenticated_user.id == user.id
+
+
+@pytest.mark.django_db
+class TestJWTTokenGenerator:
+    """Test JWTTokenGenerator"""
+
+    def test_token_pair_shares_session(self, user, django_assert_num_queries):
+        """Test the token pair is issued with a single write and one token id"""
+        with django_assert_num_queries(1):
+            access, refresh = JWTTokenGenerator.generate_token_pair(user)
+
+        access_payload = JWTTokenGenerator.verify_token(access)
+        refresh_payload = JWTTokenGenerator.verify_token(refresh)
+        user.refresh_from_db()
+        assert access_payload['token_id'] == refresh_payload['token_id'] == user.current_token_id
+        assert refresh_payload['type'] == 'refresh'
+        assert access_payload['iat'] == refresh_payload['iat']
+
+    def test_secret_key_change_invalidates_tokens(self, user, settings):
+        """Test tokens signed with a previous SECRET_KEY are rejected"""
+        token = JWTTokenGenerator.generate_token(user)
+        JWTAuthentication().authenticate(_request_with_token(token))
+
+        settings.SECRET_KEY = 'another-secret-key-for-tests-with-enough-length'
+
+        with pytest.raises(AuthenticationFailed):
+            JWTAuthentication().authenticate(_request_with_token(token))
+
+        assert JWTTokenGenerator.verify_token(token) is None
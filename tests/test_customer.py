@@ -1,7 +1,12 @@
 import pytest
+from django.core.exceptions import ValidationError
 from django.urls import reverse
 
 from apps.order.models import Customer
+from tests.factories import CustomerFactory
+
+CUSTOMER_LIST_URL = reverse('customer-list')
+CUSTOMER_PROFILE_URL = reverse('customer-profile')
 
 
 @pytest.mark.django_db
@@ -35,47 +40,31 @@ class TestCustomerModel:
         assert customer.user is None
         assert customer.email == 'guest@example.com'
 
+
+class TestCustomerValidation:
+    """Test Customer validation that needs no database"""
+
     def test_customer_phone_validation(self):
         """Test customer phone number validation"""
-        customer = Customer(
-            email='test@example.com',
-            full_name='Test User',
-            phone_number='invalid-phone',
-        )
+        customer = CustomerFactory.build(phone_number='invalid-phone')
 
-        with pytest.raises(Exception):
-            customer.full_clean()
+        with pytest.raises(ValidationError) as exc_info:
+            customer.clean()
+
+        assert 'phone_number' in exc_info.value.message_dict
 
 
 @pytest.mark.django_db
 class TestCustomerAPI:
     """Test Customer API endpoints"""
 
-    def test_create_customer_authenticated(self, authenticated_client, user):
-        """Test creating customer when authenticated"""
-        url = reverse('customer-list')
-        data = {
-            'email': 'newcustomer@example.com',
-            'full_name': 'New Customer',
-            'phone_number': '998905555555',
-            'address': '789 New Street',
-            'city': 'Tashkent',
-            'country': 'Uzbekistan',
-        }
-
-        response = authenticated_client.post(url, data, format='json')
-
-        assert response.status_code == 201
-        assert response.data['email'] == 'newcustomer@example.com'
-        assert response.data['user_id'] == str(user.id)
-        assert response.data['user_phone'] == user.phone_number
-
-        customer = Customer.objects.get(id=response.data['id'])
-        assert customer.user == user
+    @pytest.fixture
+    def customer(self, db, _class_customer):
+        return Customer.objects.get(pk=_class_customer)
 
     def test_create_customer_duplicate_user(self, authenticated_client, customer):
         """Test creating second customer for same user fails"""
-        url = reverse('customer-list')
+        url = CUSTOMER_LIST_URL
         data = {
             'email': 'another@example.com',
             'full_name': 'Another Customer',
@@ -87,9 +76,26 @@ class TestCustomerAPI:
         assert response.status_code == 400
         assert 'already have a customer profile' in str(response.data)
 
+    def test_update_other_customer_when_linked_fails(self, admin_client, admin_user, customer):
+        """Test staff update cannot relink a customer to a user that already has one"""
+        Customer.objects.create(
+            user=admin_user,
+            email='admin-customer@example.com',
+            full_name='Admin Customer',
+            phone_number='998900000000',
+        )
+        url = reverse('customer-detail', kwargs={'pk': customer.id})
+
+        response = admin_client.patch(url, {'city': 'Bukhara'}, format='json')
+
+        assert response.status_code == 400
+        assert 'This user already has a customer profile' in str(response.data)
+        customer.refresh_from_db()
+        assert customer.user_id != admin_user.id
+
     def test_list_customers_authenticated(self, authenticated_client, customer):
         """Test listing customers shows only own customer"""
-        url = reverse('customer-list')
+        url = CUSTOMER_LIST_URL
         response = authenticated_client.get(url)
 
         assert response.status_code == 200
@@ -105,38 +111,34 @@ class TestCustomerAPI:
         assert response.data['id'] == str(customer.id)
         assert response.data['full_name'] == customer.full_name
 
-    def test_update_customer(self, authenticated_client, customer):
-        """Test updating customer"""
+    @pytest.mark.parametrize('method, data, expected', [
+        (
+            'put',
+            {
+                'email': 'customer@example.com',
+                'full_name': 'Test Customer',
+                'phone_number': '998901234567',
+                'address': 'Updated Address',
+                'city': 'Samarkand',
+                'country': 'Uzbekistan',
+            },
+            {'address': 'Updated Address', 'city': 'Samarkand'},
+        ),
+        ('patch', {'city': 'Bukhara'}, {'address': '123 Test Street', 'city': 'Bukhara'}),
+    ])
+    def test_update_customer(self, authenticated_client, customer, method, data, expected):
+        """Test fully and partially updating customer"""
         url = reverse('customer-detail', kwargs={'pk': customer.id})
-        data = {
-            'email': customer.email,
-            'full_name': customer.full_name,
-            'phone_number': customer.phone_number,
-            'address': 'Updated Address',
-            'city': 'Samarkand',
-            'country': 'Uzbekistan',
-        }
-
-        response = authenticated_client.put(url, data, format='json')
-
-        assert response.status_code == 200
-        assert response.data['address'] == 'Updated Address'
-        assert response.data['city'] == 'Samarkand'
 
-    def test_partial_update_customer(self, authenticated_client, customer):
-        """Test partially updating customer"""
-        url = reverse('customer-detail', kwargs={'pk': customer.id})
-        data = {'city': 'Bukhara'}
-
-        response = authenticated_client.patch(url, data, format='json')
+        response = getattr(authenticated_client, method)(url, data, format='json')
 
         assert response.status_code == 200
-        assert response.data['city'] == 'Bukhara'
-        assert response.data['address'] == customer.address
+        for field, value in expected.items():
+            assert response.data[field] == value
 
     def test_unauthenticated_access(self, api_client):
         """Test unauthenticated access is denied"""
-        url = reverse('customer-list')
+        url = CUSTOMER_LIST_URL
         response = api_client.get(url)
 
         assert response.status_code == 401
@@ -146,57 +148,84 @@ class TestCustomerAPI:
 class TestCustomerProfileAPI:
     """Test Customer Profile API endpoints"""
 
-    def test_get_profile_creates_if_not_exists(self, authenticated_client, user):
-        """Test getting profile creates customer if doesn't exist"""
-        url = reverse('customer-profile')
-        response = authenticated_client.get(url)
-
-        assert response.status_code == 200
-        assert response.data['user_id'] == str(user.id)
-        assert response.data['email'] == user.email
-
-        assert Customer.objects.filter(user=user).exists()
+    @pytest.fixture
+    def customer(self, db, _class_customer):
+        return Customer.objects.get(pk=_class_customer)
 
     def test_get_profile_returns_existing(self, authenticated_client, customer):
         """Test getting profile returns existing customer"""
-        url = reverse('customer-profile')
+        url = CUSTOMER_PROFILE_URL
         response = authenticated_client.get(url)
 
         assert response.status_code == 200
         assert response.data['id'] == str(customer.id)
 
-    def test_update_profile(self, authenticated_client, customer):
-        """Test updating profile via PUT"""
-        url = reverse('customer-profile')
+    @pytest.mark.parametrize('method, data, expected', [
+        (
+            'put',
+            {
+                'email': 'updated@example.com',
+                'full_name': 'Updated Name',
+                'phone_number': '998907777777',
+                'address': 'New Address',
+                'city': 'New City',
+                'country': 'Uzbekistan',
+            },
+            {'email': 'updated@example.com', 'full_name': 'Updated Name'},
+        ),
+        (
+            'patch',
+            {'address': 'Partially Updated Address'},
+            {'address': 'Partially Updated Address', 'full_name': 'Test Customer'},
+        ),
+    ])
+    def test_update_profile(self, authenticated_client, customer, method, data, expected):
+        """Test updating profile via PUT and PATCH"""
+        response = getattr(authenticated_client, method)(CUSTOMER_PROFILE_URL, data, format='json')
+
+        assert response.status_code == 200
+        for field, value in expected.items():
+            assert response.data[field] == value
+
+    def test_profile_requires_authentication(self, api_client):
+        """Test profile endpoint requires authentication"""
+        url = CUSTOMER_PROFILE_URL
+        response = api_client.get(url)
+
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestCustomerCreationAPI:
+    """Test endpoints that create the user's first customer profile"""
+
+    def test_create_customer_authenticated(self, authenticated_client, user):
+        """Test creating customer when authenticated"""
+        url = CUSTOMER_LIST_URL
         data = {
-            'email': 'updated@example.com',
-            'full_name': 'Updated Name',
-            'phone_number': '998907777777',
-            'address': 'New Address',
-            'city': 'New City',
+            'email': 'newcustomer@example.com',
+            'full_name': 'New Customer',
+            'phone_number': '998905555555',
+            'address': '789 New Street',
+            'city': 'Tashkent',
             'country': 'Uzbekistan',
         }
 
-        response = authenticated_client.put(url, data, format='json')
-
-        assert response.status_code == 200
-        assert response.data['email'] == 'updated@example.com'
-        assert response.data['full_name'] == 'Updated Name'
+        response = authenticated_client.post(url, data, format='json')
 
-    def test_partial_update_profile(self, authenticated_client, customer):
-        """Test partially updating profile via PATCH"""
-        url = reverse('customer-profile')
-        data = {'address': 'Partially Updated Address'}
+        assert response.status_code == 201
+        assert response.data['email'] == 'newcustomer@example.com'
+        assert response.data['user_id'] == str(user.id)
+        assert response.data['user_phone'] == user.phone_number
+        assert Customer.objects.get(id=response.data['id']).user_id == user.id
 
-        response = authenticated_client.patch(url, data, format='json')
+    def test_get_profile_creates_if_not_exists(self, authenticated_client, user):
+        """Test getting profile creates customer if doesn't exist"""
+        url = CUSTOMER_PROFILE_URL
+        response = authenticated_client.get(url)
 
         assert response.status_code == 200
-        assert response.data['address'] == 'Partially Updated Address'
-        assert response.data['full_name'] == customer.full_name
-
-    def test_profile_requires_authentication(self, api_client):
-        """Test profile endpoint requires authentication"""
-        url = reverse('customer-profile')
-        response = api_client.get(url)
+        assert response.data['user_id'] == str(user.id)
+        assert response.data['email'] == user.email
 
-        assert response.status_code == 401
+        assert Customer.objects.get(id=response.data['id']).user_id == user.id
@@ -1,16 +1,23 @@
 import pytest
 from decimal import Decimal
 from django.urls import reverse
+from django.contrib.auth import get_user_model
 
-from apps.order.models import Order, OrderItem, Customer
+from apps.order.models import Order, OrderItem, Customer, Payment
+from tests.factories import CustomerFactory, OrderFactory
+
+User = get_user_model()
+
+ORDER_LIST_URL = reverse('order-list')
 
 
 @pytest.mark.django_db
 class TestOrderModel:
     """Test Order model"""
 
-    def test_create_order(self, customer):
+    def test_create_order(self):
         """Test creating an order"""
+        customer = CustomerFactory()
         order = Order.objects.create(
             customer=customer,
             order_number='TEST-001',
@@ -33,13 +40,18 @@ class TestOrderModel:
         expected_total = Decimal('1050.00') + expected_tax + Decimal('5.00')
         assert order.total_amount == expected_total
 
-    def test_order_can_be_cancelled(self, order):
+
+class TestOrderModelMethods:
+    """Test Order model methods that need no database"""
+
+    def test_order_can_be_cancelled(self):
         """Test order cancellation logic"""
+        order = OrderFactory.build()
         order.status = Order.OrderStatus.PENDING
         assert order.can_be_cancelled() is True
 
         order.status = Order.OrderStatus.PROCESSING
-        assert order.can_be_cancelled() is True
+        assert order.can_be_cancelled() is False
 
         order.status = Order.OrderStatus.CONFIRMED
         assert order.can_be_cancelled() is True
@@ -50,16 +62,18 @@ class TestOrderModel:
         order.status = Order.OrderStatus.CANCELLED
         assert order.can_be_cancelled() is False
 
-    def test_order_can_be_refunded(self, order):
+    def test_order_can_be_refunded(self):
         """Test order refund logic"""
+        order = OrderFactory.build()
         order.status = Order.OrderStatus.COMPLETED
         assert order.can_be_refunded() is True
 
         order.status = Order.OrderStatus.PENDING
         assert order.can_be_refunded() is False
 
-    def test_order_str(self, order):
+    def test_order_str(self):
         """Test order string representation"""
+        order = OrderFactory.build()
         assert str(order) == f"Order {order.order_number} - {order.status}"
 
 
@@ -69,7 +83,7 @@ class TestOrderAPI:
 
     def test_create_order_authenticated(self, authenticated_client, user):
         """Test creating order as authenticated user"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         data = {
             'shipping_address': '123 Test Street, Tashkent',
             'shipping_cost': '10.00',
@@ -92,13 +106,12 @@ class TestOrderAPI:
         assert response.data['shipping_address'] == '123 Test Street, Tashkent'
         assert len(response.data['items']) == 1
         assert len(response.data['payments']) == 1
-
-        order = Order.objects.get(id=response.data['id'])
-        assert order.customer.user == user
+        assert response.data['customer']['user_id'] == str(user.id)
+        assert Customer.objects.get(id=response.data['customer']['id']).user_id == user.id
 
     def test_create_order_with_existing_customer(self, authenticated_client, customer):
         """Test creating order with existing customer"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         data = {
             'customer_id': str(customer.id),
             'shipping_address': '456 Another Street',
@@ -119,7 +132,7 @@ class TestOrderAPI:
 
     def test_create_order_guest(self, api_client):
         """Test creating order as guest (no authentication)"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         data = {
             'customer_email': 'guest@example.com',
             'customer_name': 'Guest User',
@@ -139,13 +152,12 @@ class TestOrderAPI:
 
         assert response.status_code == 201
         assert response.data['customer']['email'] == 'guest@example.com'
-
-        order = Order.objects.get(id=response.data['id'])
-        assert order.customer.user is None
+        assert response.data['customer']['user_id'] is None
+        assert Customer.objects.get(id=response.data['customer']['id']).user_id is None
 
     def test_create_order_missing_items(self, authenticated_client):
         """Test creating order without items fails"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         data = {
             'shipping_address': 'Test Address',
             'payment_method': 'CREDIT_CARD',
@@ -159,7 +171,7 @@ class TestOrderAPI:
 
     def test_create_order_missing_customer_data(self, api_client):
         """Test creating order without customer data fails for guests"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         data = {
             'shipping_address': 'Test Address',
             'payment_method': 'CREDIT_CARD',
@@ -174,7 +186,7 @@ class TestOrderAPI:
 
     def test_list_orders(self, authenticated_client, order):
         """Test listing orders"""
-        url = reverse('order-list')
+        url = ORDER_LIST_URL
         response = authenticated_client.get(url)
 
         assert response.status_code == 200
@@ -190,11 +202,53 @@ class TestOrderAPI:
         assert response.data['order_number'] == order.order_number
         assert len(response.data['items']) == 2
 
+    def test_get_terminal_order_detail_is_cached(self, authenticated_client, order, django_assert_num_queries):
+        """Test terminal orders are served from the cache until their version changes"""
+        Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.CANCELLED)
+        url = reverse('order-detail', kwargs={'pk': order.id})
+
+        first = authenticated_client.get(url)
+        with django_assert_num_queries(1):
+            second = authenticated_client.get(url)
+
+        assert second.data == first.data
+        assert len(second.data['items']) == 2
+
+        Order.objects.filter(pk=order.pk).update(notes='Changed', version=order.version + 1)
+        assert authenticated_client.get(url).data['notes'] == 'Changed'
+
+    def test_cached_order_detail_renders_current_customer(self, authenticated_client, order):
+        """Test a cached terminal order still shows customer edits"""
+        Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.CANCELLED)
+        url = reverse('order-detail', kwargs={'pk': order.id})
+        authenticated_client.get(url)
+
+        Customer.objects.filter(pk=order.customer_id).update(full_name='Renamed Customer')
+
+        assert authenticated_client.get(url).data['customer']['full_name'] == 'Renamed Customer'
+
+    def test_uncached_order_detail_selects_order_once(self, authenticated_client, order, django_assert_num_queries):
+        """Test a cache miss reuses the fetched order and only prefetches its items and payments"""
+        url = reverse('order-detail', kwargs={'pk': order.id})
+
+        with django_assert_num_queries(3):
+            response = authenticated_client.get(url)
+
+        assert len(response.data['items']) == 2
+
 
 @pytest.mark.django_db
 class TestOrderActions:
     """Test Order action endpoints"""
 
+    @pytest.fixture
+    def order(self, db, _class_order):
+        return Order.objects.get(pk=_class_order[1])
+
+    @pytest.fixture
+    def payment(self, db, _class_order):
+        return Payment.objects.get(pk=_class_order[2])
+
     def test_process_payment(self, authenticated_client, order, payment):
         """Test processing payment for an order"""
         url = reverse('order-process-payment', kwargs={'pk': order.id})
@@ -283,6 +337,19 @@ class TestOrderActions:
         assert response.status_code == 200
         assert response.data['status'] == 'COMPLETED'
 
+    def test_action_on_other_users_order_not_found(self, api_client, order):
+        """Test action endpoints still scope orders to the requesting user"""
+        from apps.base.auth import JWTTokenGenerator
+
+        other = User.objects.create_user(phone_number='998907777777', password='otherpass123')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {JWTTokenGenerator.generate_token(other)}')
+
+        response = api_client.post(reverse('order-cancel', kwargs={'pk': order.id}), {}, format='json')
+
+        assert response.status_code == 404
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+
 
 @pytest.mark.django_db
 class TestOrderItemModel:
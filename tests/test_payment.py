@@ -1,9 +1,41 @@
 import pytest
+from datetime import timedelta
 from decimal import Decimal
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db.models import Count, F, Q
 from django.utils import timezone
 
 from apps.order.models import Payment, Order
-from apps.order.services import OrderService, PaymentProcessingError
+from apps.order.serializers import PaymentSerializer
+from apps.order.services import OrderProcessingError, OrderService, PaymentProcessingError
+
+_PAYMENT_METHODS = frozenset(Payment.PaymentMethod.values)
+_PAYMENT_STATUSES = frozenset(Payment.PaymentStatus.values)
+
+
+@pytest.fixture
+def gateway_enabled(settings):
+    """Route payments through the (simulated) gateway call"""
+    settings.PAYMENT_GATEWAY_ENABLED = True
+
+
+class SharedOrderGraph:
+    """
+    Reuse one order and payment for every test of the class
+
+    The rows are created once per class and each test reloads them; changes
+    a test makes are rolled back with its transaction.
+    """
+
+    @pytest.fixture
+    def order(self, db, _class_order):
+        return Order.objects.get(pk=_class_order[1])
+
+    @pytest.fixture
+    def payment(self, db, _class_order):
+        return Payment.objects.get(pk=_class_order[2])
 
 
 @pytest.mark.django_db
@@ -29,31 +61,23 @@ class TestPaymentModel:
         """Test payment string representation"""
         assert str(payment) == f"Payment {payment.transaction_id} - {payment.status}"
 
-    def test_payment_methods(self):
-        """Test payment method choices"""
-        methods = [choice[0] for choice in Payment.PaymentMethod.choices]
 
-        assert 'CREDIT_CARD' in methods
-        assert 'DEBIT_CARD' in methods
-        assert 'PAYPAL' in methods
-        assert 'BANK_TRANSFER' in methods
-        assert 'CASH' in methods
-        assert 'CRYPTO' in methods
+class TestPaymentChoices:
+    """Test Payment choice definitions"""
 
-    def test_payment_statuses(self):
-        """Test payment status choices"""
-        statuses = [choice[0] for choice in Payment.PaymentStatus.choices]
+    @pytest.mark.parametrize('method', ['CREDIT_CARD', 'DEBIT_CARD', 'PAYPAL', 'BANK_TRANSFER', 'CASH', 'CRYPTO'])
+    def test_payment_methods(self, method):
+        """Test payment method choices"""
+        assert method in _PAYMENT_METHODS
 
-        assert 'PENDING' in statuses
-        assert 'PROCESSING' in statuses
-        assert 'COMPLETED' in statuses
-        assert 'FAILED' in statuses
-        assert 'REFUNDED' in statuses
-        assert 'CANCELLED' in statuses
+    @pytest.mark.parametrize('status', ['PENDING', 'PROCESSING', 'COMPLETED', 'FAILED', 'REFUNDED', 'CANCELLED'])
+    def test_payment_statuses(self, status):
+        """Test payment status choices"""
+        assert status in _PAYMENT_STATUSES
 
 
 @pytest.mark.django_db
-class TestPaymentProcessing:
+class TestPaymentProcessing(SharedOrderGraph):
     """Test payment processing logic"""
 
     def test_process_payment_success(self, order, payment):
@@ -67,10 +91,8 @@ class TestPaymentProcessing:
         assert result.processed_at is not None
         assert result.payment_gateway == 'stripe'
         assert result.gateway_response['status'] == 'success'
-
-        order.refresh_from_db()
-        assert order.status == Order.OrderStatus.CONFIRMED
-        assert order.version == 1
+        assert result.order.status == Order.OrderStatus.CONFIRMED
+        assert result.order.version == 2
 
     def test_process_payment_invalid_status(self, order, payment):
         """Test processing payment for order in invalid status"""
@@ -85,44 +107,299 @@ class TestPaymentProcessing:
 
         assert 'cannot be processed' in str(exc_info.value)
 
-    def test_process_payment_no_pending_payment(self, order):
-        """Test processing payment when no pending payment exists"""
-        with pytest.raises(PaymentProcessingError) as exc_info:
-            OrderService.process_payment(order_id=str(order.id))
+    def test_process_payment_rejects_stale_version(self, order, payment, gateway_enabled):
+        """Test the order is not confirmed when its version changed after the claim"""
+        def bump_version(_payment):
+            Order.objects.filter(pk=order.pk).update(version=F('version') + 1)
+            return True
 
-        assert 'No pending payment' in str(exc_info.value)
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=bump_version):
+            with pytest.raises(PaymentProcessingError, match='modified concurrently'):
+                OrderService.process_payment(order_id=str(order.id))
+
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.CANCELLED
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        assert order.payments.filter(status=Payment.PaymentStatus.PENDING).exists()
+
+    def test_process_payment_claim_rejects_stale_version(self, order, payment):
+        """Test the claim fails and leaves the payment pending when the order version moved"""
+        lock_payment = Payment.objects.select_for_update
+
+        def bump_then_lock(*args, **kwargs):
+            Order.objects.filter(pk=order.pk).update(version=F('version') + 1)
+            return lock_payment(*args, **kwargs)
+
+        with mock.patch.object(Payment.objects, 'select_for_update', side_effect=bump_then_lock):
+            with pytest.raises(PaymentProcessingError, match='modified concurrently'):
+                OrderService.process_payment(order_id=str(order.id))
+
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.PENDING
+
+    def test_payment_processing_updates_order_version(self, order, payment):
+        """Test claiming and confirming the payment each increment the order version"""
+        initial_version = order.version
 
-    def test_process_payment_uses_select_for_update(self, order, payment):
-        """Test that payment processing locks the order"""
         result = OrderService.process_payment(order_id=str(order.id))
 
-        assert result.status == Payment.PaymentStatus.COMPLETED
+        assert result.order.version == initial_version + 2
+
+    def test_process_payment_voids_charge_on_concurrent_order_change(self, order, payment, gateway_enabled):
+        """Test a captured charge is voided when the order changes mid-processing"""
+        def cancel_behind_service(_payment):
+            Order.objects.filter(pk=order.pk).update(
+                status=Order.OrderStatus.CANCELLED, version=F('version') + 1
+            )
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=cancel_behind_service), \
+                mock.patch.object(OrderService, '_simulate_payment_void') as void:
+            with pytest.raises(PaymentProcessingError) as exc_info:
+                OrderService.process_payment(order_id=str(order.id))
 
+        assert 'modified concurrently' in str(exc_info.value)
+        void.assert_called_once()
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.CANCELLED
+        assert payment.gateway_response['status'] == 'voided'
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.CANCELLED
+
+    def test_cancel_refused_during_charge(self, order, payment, gateway_enabled):
+        """Test the order cannot be cancelled while its payment is at the gateway"""
+        def cancel_during_charge(_payment):
+            with pytest.raises(OrderProcessingError, match='cannot be cancelled'):
+                OrderService.cancel_order(order_id=str(order.id))
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=cancel_during_charge), \
+                mock.patch.object(OrderService, '_simulate_payment_void') as void:
+            result = OrderService.process_payment(order_id=str(order.id))
+
+        void.assert_not_called()
+        assert result.status == Payment.PaymentStatus.COMPLETED
         order.refresh_from_db()
         assert order.status == Order.OrderStatus.CONFIRMED
 
-    def test_payment_processing_updates_order_version(self, order, payment):
-        """Test payment processing increments order version"""
-        initial_version = order.version
+    def test_process_payment_refused_while_processing(self, order, payment, gateway_enabled):
+        """Test a second payment attempt is refused while the first is at the gateway"""
+        def pay_again(_payment):
+            with pytest.raises(PaymentProcessingError, match='cannot be processed'):
+                OrderService.process_payment(order_id=str(order.id))
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=pay_again):
+            result = OrderService.process_payment(order_id=str(order.id))
+
+        assert result.status == Payment.PaymentStatus.COMPLETED
+
+    def test_process_payment_declined(self, order, payment, gateway_enabled):
+        """Test a declined payment is recorded as failed and the order stays payable"""
+        with mock.patch.object(OrderService, '_simulate_payment_processing', return_value=False):
+            with pytest.raises(PaymentProcessingError) as exc_info:
+                OrderService.process_payment(order_id=str(order.id))
+
+        assert 'Payment processing failed' in str(exc_info.value)
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.FAILED
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        retry = order.payments.get(status=Payment.PaymentStatus.PENDING)
+        assert (retry.amount, retry.payment_method) == (payment.amount, payment.payment_method)
+
+    def test_process_payment_retry_after_decline(self, order, payment, gateway_enabled):
+        """Test a declined order can be paid by a later attempt"""
+        with mock.patch.object(OrderService, '_simulate_payment_processing', return_value=False):
+            with pytest.raises(PaymentProcessingError):
+                OrderService.process_payment(order_id=str(order.id))
+
+        result = OrderService.process_payment(order_id=str(order.id), payment_gateway='stripe')
+
+        assert result.status == Payment.PaymentStatus.COMPLETED
+        assert result.pk != payment.pk
+        assert result.order.status == Order.OrderStatus.CONFIRMED
+        assert dict(order.payments.values_list('pk', 'status')) == {
+            payment.pk: Payment.PaymentStatus.FAILED,
+            result.pk: Payment.PaymentStatus.COMPLETED,
+        }
+
+    def test_payment_claimed_before_gateway_call(self, order, payment, gateway_enabled):
+        """Test the payment is stored as PROCESSING before the gateway is called"""
+        def check_claimed(claimed):
+            assert claimed.status == Payment.PaymentStatus.PROCESSING
+            assert Payment.objects.get(pk=claimed.pk).status == Payment.PaymentStatus.PROCESSING
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=check_claimed):
+            result = OrderService.process_payment(order_id=str(order.id))
+
+        assert result.status == Payment.PaymentStatus.COMPLETED
+
+    def test_gateway_error_does_not_leave_payment_processing(self, order, payment, gateway_enabled):
+        """Test a gateway exception records the claimed payment as failed"""
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=ConnectionError('timeout')):
+            with pytest.raises(PaymentProcessingError):
+                OrderService.process_payment(order_id=str(order.id))
+
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.FAILED
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        assert order.payments.filter(status=Payment.PaymentStatus.PENDING).exists()
+
+    def test_payment_changed_during_charge_releases_order(self, order, payment, gateway_enabled):
+        """Test a payment changed behind the service still leaves the order payable"""
+        def fail_behind_service(claimed):
+            Payment.objects.filter(pk=claimed.pk).update(status=Payment.PaymentStatus.FAILED)
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=fail_behind_service), \
+                mock.patch.object(OrderService, '_simulate_payment_void', return_value=True) as void:
+            with pytest.raises(PaymentProcessingError, match='cancelled during processing'):
+                OrderService.process_payment(order_id=str(order.id))
+
+        void.assert_called_once()
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        assert order.payments.filter(status=Payment.PaymentStatus.PENDING).exists()
+
+    def test_failed_void_is_recorded(self, order, payment, gateway_enabled):
+        """Test a charge the gateway could not void is flagged for a manual refund"""
+        def cancel_behind_service(_payment):
+            Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.CANCELLED)
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=cancel_behind_service), \
+                mock.patch.object(OrderService, '_simulate_payment_void', return_value=False):
+            with pytest.raises(PaymentProcessingError, match='manual refund'):
+                OrderService.process_payment(order_id=str(order.id))
+
+        payment.refresh_from_db()
+        assert payment.gateway_response['status'] == 'void_failed'
+
+    def test_gateway_skipped_when_disabled(self, order, payment, settings):
+        """Test payments are accepted without a gateway call while the gateway is disabled"""
+        settings.PAYMENT_GATEWAY_ENABLED = False
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing') as gateway:
+            result = OrderService.process_payment(order_id=str(order.id))
+
+        gateway.assert_not_called()
+        assert result.status == Payment.PaymentStatus.COMPLETED
 
+    def test_processed_payment_shares_transaction_timestamp(self, order, payment):
+        """Test the payment and the confirmed order record one timestamp"""
         OrderService.process_payment(order_id=str(order.id))
 
+        payment.refresh_from_db()
+        order.refresh_from_db()
+        assert payment.processed_at == payment.updated_at == order.updated_at
+
+    def test_processed_payment_matches_stored_row(self, order, payment, django_assert_num_queries):
+        """Test returned payment serializes the same as the stored row, without deferred loads"""
+        result = OrderService.process_payment(order_id=str(order.id), payment_gateway='stripe')
+
+        with django_assert_num_queries(0):
+            data = PaymentSerializer(result).data
+
+        stored = Payment.objects.get(id=result.id)
+        assert data == PaymentSerializer(stored).data
+
+
+@pytest.mark.django_db
+class TestStalePaymentRelease(SharedOrderGraph):
+    """Test recovery of payment claims abandoned at the gateway"""
+
+    def _claim(self, order, age=timedelta(hours=1)):
+        claimed_order, claimed = OrderService._begin_payment(str(order.id), 'stripe')
+        Order.objects.filter(pk=order.pk).update(updated_at=timezone.now() - age)
+        return claimed_order, claimed
+
+    def test_release_stale_claim(self, order, payment):
+        """Test an old claim is failed and its order returned to PENDING with a new payment"""
+        self._claim(order)
+
+        assert OrderService.release_stale_payments(timedelta(minutes=5)) == 1
+
         order.refresh_from_db()
-        assert order.version == initial_version + 1
+        assert order.status == Order.OrderStatus.PENDING
+        payment.refresh_from_db()
+        assert payment.status == Payment.PaymentStatus.FAILED
+        retry = order.payments.get(status=Payment.PaymentStatus.PENDING)
+        assert retry.amount == payment.amount
+
+    def test_recent_claim_is_kept(self, order, payment):
+        """Test a claim younger than the timeout is left with its worker"""
+        self._claim(order, age=timedelta(0))
+
+        assert OrderService.release_stale_payments(timedelta(minutes=5)) == 0
+
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PROCESSING
+
+    def test_released_order_can_be_paid(self, order, payment):
+        """Test a released order accepts a new payment attempt"""
+        self._claim(order)
+        OrderService.release_stale_payments(timedelta(minutes=5))
+
+        result = OrderService.process_payment(order_id=str(order.id))
+
+        assert result.status == Payment.PaymentStatus.COMPLETED
+        assert result.order.status == Order.OrderStatus.CONFIRMED
+
+    def test_late_worker_voids_charge(self, order, payment, gateway_enabled):
+        """Test a worker finishing after its claim was released voids the charge"""
+        def release_during_charge(_payment):
+            OrderService.release_stale_payments(timedelta(0))
+            return True
+
+        with mock.patch.object(OrderService, '_simulate_payment_processing', side_effect=release_during_charge), \
+                mock.patch.object(OrderService, '_simulate_payment_void', return_value=True) as void:
+            with pytest.raises(PaymentProcessingError):
+                OrderService.process_payment(order_id=str(order.id))
+
+        void.assert_called_once()
+        order.refresh_from_db()
+        assert order.status == Order.OrderStatus.PENDING
+        assert order.payments.filter(status=Payment.PaymentStatus.PENDING).count() == 1
+
+    def test_release_command(self, order, payment):
+        """Test the management command releases stale claims"""
+        self._claim(order)
+        out = StringIO()
+
+        call_command('release_stale_payments', '--timeout', '300', stdout=out)
+
+        assert 'Released 1' in out.getvalue()
+
+
+@pytest.mark.django_db
+class TestPaymentProcessingWithoutPayment:
+    """Test payment processing for orders without a payment"""
+
+    def test_process_payment_no_pending_payment(self, order):
+        """Test processing payment when no pending payment exists"""
+        with pytest.raises(PaymentProcessingError) as exc_info:
+            OrderService.process_payment(order_id=str(order.id))
+
+        assert 'No pending payment' in str(exc_info.value)
 
 
 @pytest.mark.django_db
-class TestPaymentRefund:
+class TestPaymentRefund(SharedOrderGraph):
     """Test payment refund logic"""
 
+    def _complete(self, order, payment):
+        Order.objects.filter(pk=order.pk).update(status=Order.OrderStatus.COMPLETED)
+        Payment.objects.filter(pk=payment.pk).update(
+            status=Payment.PaymentStatus.COMPLETED, processed_at=timezone.now()
+        )
+
     def test_refund_payment(self, order, payment):
         """Test refunding a payment"""
-        order.status = Order.OrderStatus.COMPLETED
-        order.save()
-
-        payment.status = Payment.PaymentStatus.COMPLETED
-        payment.processed_at = timezone.now()
-        payment.save()
+        self._complete(order, payment)
 
         refunded_order = OrderService.refund_order(
             order_id=str(order.id),
@@ -131,23 +408,15 @@ class TestPaymentRefund:
 
         assert refunded_order.status == Order.OrderStatus.REFUNDED
 
-        refund_payments = Payment.objects.filter(
+        refund_amounts = list(Payment.objects.filter(
             order=order,
             status=Payment.PaymentStatus.REFUNDED
-        )
-        assert refund_payments.count() == 1
-
-        refund_payment = refund_payments.first()
-        assert refund_payment.amount == -order.total_amount
+        ).values_list('amount', flat=True))
+        assert refund_amounts == [-order.total_amount]
 
     def test_partial_refund_payment(self, order, payment):
         """Test partial refund"""
-        order.status = Order.OrderStatus.COMPLETED
-        order.save()
-
-        payment.status = Payment.PaymentStatus.COMPLETED
-        payment.processed_at = timezone.now()
-        payment.save()
+        self._complete(order, payment)
 
         refund_amount = Decimal('50.00')
         refunded_order = OrderService.refund_order(
@@ -156,12 +425,12 @@ class TestPaymentRefund:
             amount=refund_amount
         )
 
-        refund_payment = Payment.objects.filter(
+        refund_amounts = list(Payment.objects.filter(
             order=order,
             status=Payment.PaymentStatus.REFUNDED
-        ).first()
+        ).values_list('amount', flat=True))
 
-        assert refund_payment.amount == -refund_amount
+        assert refund_amounts == [-refund_amount]
 
     def test_refund_invalid_status(self, order, payment):
         """Test refund fails for non-completed orders"""
@@ -175,11 +444,7 @@ class TestPaymentRefund:
 
     def test_refund_amount_exceeds_total(self, order, payment):
         """Test refund amount cannot exceed order total"""
-        order.status = Order.OrderStatus.COMPLETED
-        order.save()
-
-        payment.status = Payment.PaymentStatus.COMPLETED
-        payment.save()
+        self._complete(order, payment)
 
         with pytest.raises(Exception) as exc_info:
             OrderService.refund_order(
@@ -192,7 +457,7 @@ class TestPaymentRefund:
 
 
 @pytest.mark.django_db
-class TestPaymentCancellation:
+class TestPaymentCancellation(SharedOrderGraph):
     """Test payment cancellation"""
 
     def test_cancel_pending_payment_on_order_cancel(self, order, payment):
@@ -213,22 +478,23 @@ class TestMultiplePayments:
 
     def test_order_with_multiple_payment_attempts(self, order):
         """Test order can have multiple payment attempts"""
-        payment1 = Payment.objects.create(
-            order=order,
-            transaction_id='TXN-001',
-            payment_method=Payment.PaymentMethod.CREDIT_CARD,
-            amount=order.total_amount,
-            status=Payment.PaymentStatus.FAILED,
-            error_message='Card declined',
-        )
-
-        payment2 = Payment.objects.create(
-            order=order,
-            transaction_id='TXN-002',
-            payment_method=Payment.PaymentMethod.PAYPAL,
-            amount=order.total_amount,
-            status=Payment.PaymentStatus.PENDING,
-        )
+        Payment.objects.bulk_create([
+            Payment(
+                order=order,
+                transaction_id='TXN-001',
+                payment_method=Payment.PaymentMethod.CREDIT_CARD,
+                amount=order.total_amount,
+                status=Payment.PaymentStatus.FAILED,
+                error_message='Card declined',
+            ),
+            Payment(
+                order=order,
+                transaction_id='TXN-002',
+                payment_method=Payment.PaymentMethod.PAYPAL,
+                amount=order.total_amount,
+                status=Payment.PaymentStatus.PENDING,
+            ),
+        ])
 
         result = OrderService.process_payment(
             order_id=str(order.id),
@@ -238,9 +504,12 @@ class TestMultiplePayments:
         assert result.transaction_id == 'TXN-002'
         assert result.status == Payment.PaymentStatus.COMPLETED
 
-        assert order.payments.count() == 2
-        assert order.payments.filter(status=Payment.PaymentStatus.FAILED).count() == 1
-        assert order.payments.filter(status=Payment.PaymentStatus.COMPLETED).count() == 1
+        stats = order.payments.aggregate(
+            total=Count('id'),
+            failed=Count('id', filter=Q(status=Payment.PaymentStatus.FAILED)),
+            completed=Count('id', filter=Q(status=Payment.PaymentStatus.COMPLETED)),
+        )
+        assert stats == {'total': 2, 'failed': 1, 'completed': 1}
 
 
 @pytest.mark.django_db
@@ -255,7 +524,6 @@ class TestPaymentGatewayIntegration:
         )
 
         payment.refresh_from_db()
-        assert 'gateway_response' in dir(payment)
         assert payment.gateway_response is not None
         assert isinstance(payment.gateway_response, dict)
         assert payment.gateway_response.get('status') == 'success'
@@ -264,8 +532,8 @@ class TestPaymentGatewayIntegration:
         """Test payments can use different gateways"""
         gateways = ['stripe', 'paypal', 'square']
 
-        for gateway in gateways:
-            payment = Payment.objects.create(
+        payments = Payment.objects.bulk_create([
+            Payment(
                 order=order,
                 transaction_id=f'TXN-{gateway.upper()}',
                 payment_method=Payment.PaymentMethod.CREDIT_CARD,
@@ -273,8 +541,12 @@ class TestPaymentGatewayIntegration:
                 status=Payment.PaymentStatus.PENDING,
                 payment_gateway=gateway,
             )
+            for gateway in gateways
+        ])
 
-            assert payment.payment_gateway == gateway
+        stored = dict(order.payments.values_list('transaction_id', 'payment_gateway'))
+        for payment, gateway in zip(payments, gateways):
+            assert stored[payment.transaction_id] == gateway
 
     def test_payment_currency_support(self, order):
         """Test payment supports different currencies"""
@@ -0,0 +1,47 @@
+import json
+import os
+import subprocess
+import sys
+import pytest
+from unittest import mock
+from django.urls import reverse
+from drf_spectacular.generators import SchemaGenerator
+
+
+@pytest.mark.django_db
+class TestSchemaView:
+    """Test the OpenAPI schema endpoint"""
+
+    def test_schema_is_generated_once(self, api_client):
+        """Test repeated schema requests are served from the cache"""
+        first = api_client.get(reverse('schema'))
+        with mock.patch.object(SchemaGenerator, 'get_schema', side_effect=AssertionError('schema rebuilt')):
+            second = api_client.get(reverse('schema'))
+
+        assert first.status_code == second.status_code == 200
+        assert second.content == first.content
+
+    def test_cached_schema_honours_format(self, api_client):
+        """Test the cached schema is still rendered in the requested format"""
+        yaml_response = api_client.get(reverse('schema'))
+        json_response = api_client.get(reverse('schema'), {'format': 'json'})
+        accept_response = api_client.get(reverse('schema'), HTTP_ACCEPT='application/json')
+
+        assert yaml_response['Content-Type'].startswith('application/vnd.oai.openapi;')
+        assert json_response['Content-Type'].startswith('application/vnd.oai.openapi+json')
+        assert accept_response['Content-Type'].startswith('application/json')
+        assert json.loads(json_response.content) == json.loads(accept_response.content)
+        assert not yaml_response.content.startswith(b'{')
+
+    def test_docs_views_load_on_first_request(self):
+        """Test loading the URLconf does not import the drf_spectacular views"""
+        code = (
+            'import sys, django; django.setup(); '
+            'from django.urls import get_resolver; get_resolver().url_patterns; '
+            'print("drf_spectacular.views" in sys.modules)'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'core.test_settings'},
+        )
+        assert result.stdout.strip() == 'False'
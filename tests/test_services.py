@@ -1,7 +1,10 @@
+import re
 import pytest
 from decimal import Decimal
+from pathlib import Path
 
 from apps.order.models import Order, OrderItem, Payment
+from apps.order.serializers import OrderSerializer
 from apps.order.services import (
     OrderService,
     OrderProcessingError,
@@ -85,27 +88,80 @@ class TestOrderServiceCreateOrder:
         assert order.order_number is not None
         assert order.order_number.startswith('ORD-')
 
-    def test_create_order_calculates_totals(self, customer):
-        """Test order totals are calculated correctly"""
+    def test_create_order_calculates_totals(self, customer, django_assert_num_queries):
+        """Test order totals are calculated correctly with a fixed number of queries"""
         items_data = [
             {'product_name': 'Item 1', 'quantity': 2, 'unit_price': '100.00'},
             {'product_name': 'Item 2', 'quantity': 1, 'unit_price': '50.00'},
         ]
 
+        with django_assert_num_queries(6):
+            order = OrderService.create_order(
+                customer_id=str(customer.id),
+                customer_data=None,
+                items_data=items_data,
+                shipping_address='Test',
+                shipping_cost=Decimal('5.00'),
+                payment_method=Payment.PaymentMethod.CREDIT_CARD,
+            )
+
+        assert order.subtotal == Decimal('250.00')
+
+        assert order.tax_amount == Decimal('30.00')
+
+        assert order.total_amount == Decimal('285.00')
+
+    def test_created_order_serializes_without_reselecting(self, customer, django_assert_num_queries):
+        """Test the created items and payment are rendered without querying them again"""
         order = OrderService.create_order(
             customer_id=str(customer.id),
             customer_data=None,
-            items_data=items_data,
+            items_data=[{'product_name': 'Item 1', 'quantity': 2, 'unit_price': '100.00'}],
             shipping_address='Test',
-            shipping_cost=Decimal('5.00'),
             payment_method=Payment.PaymentMethod.CREDIT_CARD,
         )
 
-        assert order.subtotal == Decimal('250.00')
+        with django_assert_num_queries(0):
+            data = OrderSerializer(order).data
 
-        assert order.tax_amount == Decimal('30.00')
+        assert [item['product_name'] for item in data['items']] == ['Item 1']
+        assert [payment['status'] for payment in data['payments']] == [Payment.PaymentStatus.PENDING]
 
-        assert order.total_amount == Decimal('285.00')
+    def test_create_order_persists_totals_and_items(self, customer):
+        """Test totals computed in memory match the stored rows"""
+        items_data = [
+            {'product_name': f'Item {i}', 'quantity': i, 'unit_price': '10.50'}
+            for i in range(1, 4)
+        ]
+
+        order = OrderService.create_order(
+            customer_id=str(customer.id),
+            customer_data=None,
+            items_data=items_data,
+            shipping_address='Test',
+            payment_method=Payment.PaymentMethod.CASH,
+        )
+        stored = Order.objects.get(id=order.id)
+
+        assert stored.items.count() == 3
+        assert stored.subtotal == Decimal('63.00')
+        assert stored.total_amount == order.total_amount
+        assert stored.calculate_totals() == order.total_amount
+
+    def test_created_order_serializes_without_queries(self, customer, django_assert_num_queries):
+        """Test the created order carries its items, payment and customer"""
+        order = OrderService.create_order(
+            customer_id=str(customer.id),
+            customer_data=None,
+            items_data=[{'product_name': 'Item', 'quantity': 2, 'unit_price': '10.00'}],
+            shipping_address='Test',
+            payment_method=Payment.PaymentMethod.CASH,
+        )
+
+        with django_assert_num_queries(0):
+            data = OrderSerializer(order).data
+
+        assert data == OrderSerializer(Order.objects.get(id=order.id)).data
 
     def test_create_order_without_items_fails(self, customer):
         """Test creating order without items raises error"""
@@ -119,6 +175,7 @@ class TestOrderServiceCreateOrder:
             )
 
         assert 'At least one order item is required' in str(exc_info.value)
+        assert not Order.objects.filter(customer=customer).exists()
 
     def test_create_order_invalid_customer_id(self):
         """Test creating order with invalid customer ID fails"""
@@ -164,12 +221,13 @@ class TestOrderServiceCreateOrder:
 class TestOrderServicePaymentProcessing:
     """Test OrderService.process_payment()"""
 
-    def test_process_payment_success(self, order, payment):
-        """Test successful payment processing"""
-        result = OrderService.process_payment(
-            order_id=str(order.id),
-            payment_gateway='test-gateway'
-        )
+    def test_process_payment_success(self, order, payment, django_assert_num_queries):
+        """Test successful payment processing with a fixed number of queries"""
+        with django_assert_num_queries(11):
+            result = OrderService.process_payment(
+                order_id=str(order.id),
+                payment_gateway='test-gateway'
+            )
 
         assert result.status == Payment.PaymentStatus.COMPLETED
         assert result.payment_gateway == 'test-gateway'
@@ -208,27 +266,54 @@ class TestOrderServiceCancellation:
         payment.refresh_from_db()
         assert payment.status == Payment.PaymentStatus.CANCELLED
 
+    def test_cancel_order_returns_stored_state(self, order, payment, django_assert_num_queries):
+        """Test returned order matches the stored row without a re-read"""
+        with django_assert_num_queries(5):
+            result = OrderService.cancel_order(order_id=str(order.id), reason='Changed mind')
+
+        stored = Order.objects.get(id=order.id)
+        assert (result.status, result.notes, result.version) == (stored.status, stored.notes, stored.version)
+        assert result.version == order.version + 1
+
+        payment.refresh_from_db()
+        assert payment.updated_at == stored.updated_at
+
 
 @pytest.mark.django_db
 class TestOrderServiceRefund:
     """Test OrderService.refund_order()"""
 
-    def test_refund_completed_order(self, order, payment):
-        """Test refunding completed order"""
+    def test_refund_completed_order(self, order, payment, django_assert_num_queries):
+        """Test refunding completed order with a fixed number of queries"""
         order.status = Order.OrderStatus.COMPLETED
         order.save()
 
         payment.status = Payment.PaymentStatus.COMPLETED
         payment.save()
 
-        result = OrderService.refund_order(
-            order_id=str(order.id),
-            reason='Product defect'
-        )
+        with django_assert_num_queries(7):
+            result = OrderService.refund_order(
+                order_id=str(order.id),
+                reason='Product defect'
+            )
 
         assert result.status == Order.OrderStatus.REFUNDED
         assert 'Product defect' in result.notes
 
+    def test_refund_appends_notes_in_database(self, order, payment):
+        """Test refund note is appended to the stored notes"""
+        Order.objects.filter(pk=order.pk).update(
+            status=Order.OrderStatus.COMPLETED, notes='Leave at the door'
+        )
+        payment.status = Payment.PaymentStatus.COMPLETED
+        payment.save()
+
+        result = OrderService.refund_order(order_id=str(order.id), reason='Product defect')
+
+        stored = Order.objects.get(id=order.id)
+        assert stored.notes.startswith('Leave at the door\nRefund reason: Product defect')
+        assert (result.notes, result.version) == (stored.notes, stored.version)
+
 
 @pytest.mark.django_db
 class TestOrderServiceCompletion:
@@ -260,6 +345,16 @@ class TestOrderServiceHelpers:
 
         assert customer1.id == customer2.id
 
+    def test_get_or_create_customer_reuses_cached_customer(self, user, customer, django_assert_num_queries):
+        """Test repeated lookups for the same user object skip the database"""
+        first = OrderService.get_or_create_customer_from_user(user)
+
+        with django_assert_num_queries(0):
+            second = OrderService.get_or_create_customer_from_user(user)
+
+        assert first.id == customer.id
+        assert second is first
+
     def test_get_or_create_customer_unauthenticated(self):
         """Test returns None for unauthenticated user"""
         result = OrderService.get_or_create_customer_from_user(None)
@@ -307,3 +402,18 @@ class TestRaceConditionPrevention:
 
         with pytest.raises(OrderProcessingError):
             OrderService.cancel_order(order_id=str(order.id))
+
+
+class TestRowLocking:
+    """Test how the service layer takes row locks"""
+
+    def test_no_bare_select_for_update(self):
+        """Test row locks never take the blocking FOR UPDATE on related rows"""
+        apps_dir = Path(__file__).resolve().parent.parent / 'apps'
+        offenders = [
+            str(path.relative_to(apps_dir))
+            for path in apps_dir.rglob('*.py')
+            if re.search(r'\.select_for_update\(\s*\)', path.read_text())
+        ]
+
+        assert offenders == []
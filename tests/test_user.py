@@ -0,0 +1,257 @@
+import pytest
+from types import SimpleNamespace
+from importlib import import_module
+from unittest import mock
+from django.apps import apps as django_apps
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError
+from django.urls import reverse
+from django.contrib.auth import get_user_model
+
+from apps.base.auth import JWTTokenGenerator
+from apps.user.serializers import SignupSerializer, UserProfileSerializer
+
+User = get_user_model()
+
+
+def _phone_number_migration():
+    return import_module('apps.user.migrations.0003_user_phone_number_max_length')
+
+
+@pytest.mark.django_db
+class TestUserModel:
+    """Test User model"""
+
+    def test_create_user_issues_single_insert(self, django_assert_num_queries):
+        """Test saving a new user runs no validation queries"""
+        with django_assert_num_queries(1):
+            User.objects.create_user(phone_number='998905550002', password='secret', email='new@example.com')
+
+    def test_duplicate_email_rejected_by_constraint(self, user):
+        """Test the database rejects a second user with the same email"""
+        with pytest.raises(IntegrityError):
+            User.objects.create_user(phone_number='998905550003', password='secret', email=user.email)
+
+    def test_update_fields_save_skips_validation(self, user):
+        """Test partial saves do not run full_clean"""
+        user.phone_number = 'invalid'
+        user.current_token_id = 'token'
+
+        user.save(update_fields=['current_token_id'])
+
+        stored = User.objects.get(pk=user.pk)
+        assert stored.current_token_id == 'token'
+        assert stored.phone_number != 'invalid'
+
+    def test_clean_rejects_trailing_newline(self, user):
+        """Test a phone number followed by a newline fails model validation"""
+        user.phone_number = '998905550002\n'
+
+        with pytest.raises(ValidationError) as exc_info:
+            user.clean()
+
+        assert 'phone_number' in exc_info.value.message_dict
+
+    def test_active_users_defers_credentials(self, user):
+        """Test listing querysets leave the password hash and session token deferred"""
+        listed = User.objects.active_users().get(pk=user.pk)
+
+        assert {'password', 'current_token_id'} <= listed.get_deferred_fields()
+        assert listed.phone_number == user.phone_number
+
+    def test_invalidate_session_single_update(self, user, django_assert_num_queries):
+        """Test the manager clears the session token without loading the user"""
+        user.current_token_id = 'token'
+        user.save(update_fields=['current_token_id'])
+
+        with django_assert_num_queries(1):
+            User.objects.invalidate_session(user.pk)
+
+        user.refresh_from_db()
+        assert user.current_token_id is None
+
+
+    def test_phone_number_migration_normalizes_long_numbers(self, user):
+        """Test the max_length migration rewrites formatted numbers that fit once normalized"""
+        User.objects.filter(pk=user.pk).update(phone_number='+998 90 555 00 09')
+
+        _phone_number_migration().normalize_phone_numbers(django_apps, None)
+
+        user.refresh_from_db()
+        assert user.phone_number == '998905550009'
+
+    def test_phone_number_migration_reports_unfixable_numbers(self, user):
+        """Test the max_length migration stops and lists numbers it cannot normalize"""
+        User.objects.filter(pk=user.pk).update(phone_number='9989055500091234')
+
+        with pytest.raises(RuntimeError, match=str(user.pk)):
+            _phone_number_migration().normalize_phone_numbers(django_apps, None)
+
+        user.refresh_from_db()
+        assert user.phone_number == '9989055500091234'
+
+
+@pytest.mark.django_db
+class TestSignupAPI:
+    """Test SignupView"""
+
+    def _signup(self, api_client, **overrides):
+        data = {
+            'phone_number': '998905550000',
+            'password': 'secure_password',
+            'password_confirm': 'secure_password',
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+        }
+        data.update(overrides)
+        return api_client.post(reverse('signup'), data, format='json')
+
+    def test_signup_success(self, api_client):
+        """Test signup creates the user and returns tokens"""
+        response = self._signup(api_client)
+
+        assert response.status_code == 201
+        assert response.data['access_token']
+        assert response.data['user']['phone_number'] == '998905550000'
+        assert User.objects.filter(phone_number='998905550000').exists()
+
+    def test_signup_duplicate_phone_number(self, api_client, user):
+        """Test signup with an existing phone number fails"""
+        response = self._signup(api_client, phone_number=user.phone_number)
+
+        assert response.status_code == 400
+        assert 'phone number already exists' in str(response.data['phone_number'])
+
+    def test_signup_duplicate_email(self, api_client, user):
+        """Test signup with an existing email fails"""
+        response = self._signup(api_client, email=user.email)
+
+        assert response.status_code == 400
+        assert 'email already exists' in str(response.data['email'])
+        assert not User.objects.filter(phone_number='998905550000').exists()
+
+    def test_signup_duplicate_reported_by_constraint_name(self, api_client, db):
+        """Test the colliding field is taken from the violated constraint's name"""
+        cause = Exception('duplicate key value violates unique constraint')
+        cause.diag = SimpleNamespace(constraint_name='unique_user_email')
+        error = IntegrityError(*cause.args)
+        error.__cause__ = cause
+
+        with mock.patch.object(SignupSerializer, 'save', side_effect=error):
+            response = self._signup(api_client)
+
+        assert response.status_code == 400
+        assert list(response.data) == ['email']
+
+    def test_signup_duplicate_ignores_error_text(self, api_client, user):
+        """Test an error message mentioning email does not hide a phone number collision"""
+        error = IntegrityError('UNIQUE constraint failed: index user_email_phone')
+
+        with mock.patch.object(SignupSerializer, 'save', side_effect=error):
+            response = self._signup(api_client, phone_number=user.phone_number)
+
+        assert response.status_code == 400
+        assert list(response.data) == ['phone_number']
+
+    def test_signup_unidentified_duplicate(self, api_client, db):
+        """Test a constraint failure that matches no stored row gets a generic error"""
+        with mock.patch.object(SignupSerializer, 'save', side_effect=IntegrityError('constraint failed')):
+            response = self._signup(api_client)
+
+        assert response.status_code == 400
+        assert 'non_field_errors' in response.data
+
+    @pytest.mark.parametrize('phone_number', ['901234567', '99890123456', '9989012345678', '998abc123456'])
+    def test_signup_invalid_phone_number(self, api_client, phone_number):
+        """Test signup rejects numbers that are not 998 followed by nine digits"""
+        response = self._signup(api_client, phone_number=phone_number)
+
+        assert response.status_code == 400
+        assert 'phone_number' in response.data
+
+    def test_signup_without_email_twice(self, api_client):
+        """Test users without an email do not conflict with each other"""
+        assert self._signup(api_client, email='').status_code == 201
+        assert self._signup(api_client, phone_number='998905550001', email='').status_code == 201
+
+
+@pytest.mark.django_db
+class TestLoginAPI:
+    """Test LoginView"""
+
+    def test_login_success(self, api_client, user, django_assert_num_queries):
+        """Test login loads the user once and stores the new session"""
+        data = {'phone_number': user.phone_number, 'password': 'testpass123'}
+
+        with django_assert_num_queries(2):
+            response = api_client.post(reverse('login'), data, format='json')
+
+        assert response.status_code == 200
+        assert response.data['user']['email'] == user.email
+        assert response.data['refresh_token']
+
+    def test_login_user_matches_profile_serializer(self, api_client, user):
+        """Test the hand-built user payload renders like UserProfileSerializer"""
+        data = {'phone_number': user.phone_number, 'password': 'testpass123'}
+        response = api_client.post(reverse('login'), data, format='json')
+
+        user.refresh_from_db()
+        assert response.json()['user'] == dict(UserProfileSerializer(user).data)
+
+    def test_login_wrong_password(self, api_client, user):
+        """Test login with a wrong password is rejected"""
+        data = {'phone_number': user.phone_number, 'password': 'wrong'}
+
+        response = api_client.post(reverse('login'), data, format='json')
+
+        assert response.status_code == 401
+
+    def test_login_unknown_user_still_hashes(self, api_client, db):
+        """Test login for an unknown phone number still runs the password hasher"""
+        data = {'phone_number': '998900000001', 'password': 'secret'}
+
+        with mock.patch.object(User, 'set_password') as set_password:
+            response = api_client.post(reverse('login'), data, format='json')
+
+        assert response.status_code == 401
+        set_password.assert_called_once_with('secret')
+
+
+@pytest.mark.django_db
+class TestRefreshTokenAPI:
+    """Test RefreshTokenView"""
+
+    def test_refresh_returns_new_access_token(self, api_client, user, django_assert_num_queries):
+        """Test refresh loads a slim user row and issues a new access token"""
+        JWTTokenGenerator.generate_token(user)
+        refresh_token = JWTTokenGenerator.generate_refresh_token(user)
+
+        with django_assert_num_queries(2):
+            response = api_client.post(reverse('refresh_token'), {'refresh_token': refresh_token}, format='json')
+
+        assert response.status_code == 200
+        assert response.data['access_token']
+
+    def test_refresh_after_new_login_fails(self, api_client, user):
+        """Test refresh token is rejected once a newer session exists"""
+        JWTTokenGenerator.generate_token(user)
+        refresh_token = JWTTokenGenerator.generate_refresh_token(user)
+        JWTTokenGenerator.generate_token(user)
+
+        response = api_client.post(reverse('refresh_token'), {'refresh_token': refresh_token}, format='json')
+
+        assert response.status_code == 401
+
+
+@pytest.mark.django_db
+class TestProfileAPI:
+    """Test ProfileView"""
+
+    def test_profile_matches_profile_serializer(self, jwt_authenticated_client, user):
+        """Test the profile payload renders like UserProfileSerializer"""
+        response = jwt_authenticated_client.get(reverse('profile'))
+
+        assert response.status_code == 200
+        user.refresh_from_db()
+        assert response.json() == dict(UserProfileSerializer(user).data)